@@ -4,11 +4,12 @@ LLM Insight Generator
 역할:
 - DuckDB의 KPI 마트(mart.daily_campaign_kpi)에서 "특정 날짜" KPI를 조회한다.
 - 전일(yday), 최근 7일 평균(w7)과 비교한 컨텍스트를 프롬프트로 구성한다.
-- OpenAI API로 "운영 관점 일일 인사이트" Markdown을 생성한다.
+- OpenAI API(Structured Outputs)로 "운영 관점 일일 인사이트"를 생성한다.
+  -> {headline, risk_level, summary_md(Markdown)} JSON으로 받아 별도 파싱 없이 저장
 - 생성된 인사이트를
   1) data/reports/insight_YYYYMMDD.md 로 저장하고
-  2) DuckDB 테이블 mart_daily_insight 에 upsert(DELETE → INSERT) 저장한다.
-    -> 동일 날짜 재실행 시 중복 row가 누적되지 않도록 보장.
+  2) DuckDB 테이블 mart_daily_insight 에 upsert(INSERT ... ON CONFLICT DO UPDATE) 저장한다.
+    -> 동일 날짜 재실행 시 중복 row가 누적되지 않도록 보장 (event_date PK).
 
 왜 이렇게 설계했나:
 - 데이터 파이프라인 결과물을 "DB + 리포트" 2중 저장
@@ -16,23 +17,29 @@ LLM Insight Generator
   - 운영/리뷰는 md 리포트를 본다.
 - LLM 결과도 '운영 데이터'로 간주해 mart에 적재
   - "LLM output"도 재현/추적/비교가 가능해짐(관측 가능성 확보)
-- 중복 방지(DELETE→INSERT)
-  - 배치 재실행/리런 상황에서 idempotent 보장
+- 중복 방지(event_date PK + ON CONFLICT upsert)
+  - 배치 재실행/리런 상황에서 idempotent 보장 (단일 statement, 단일 트랜잭션)
 
 Usage:
   python -m llm.insight_generator --date 2026-02-16
+  python -m llm.insight_generator --dates 2026-02-16,2026-02-17,2026-02-18   # 배치 프롬프트
+  python -m llm.insight_generator --dates 2026-02-16,2026-02-17 --concurrent  # 날짜별 동시 호출
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
+import hashlib
+import json
 import os
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 
 import duckdb
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 
 # -------------------------------------------------
@@ -43,6 +50,89 @@ DATA_DIR = PROJECT_ROOT / "data"
 REPORT_DIR = DATA_DIR / "reports"
 DUCKDB_PATH = DATA_DIR / "portfolio.duckdb"
 
+# 배치 프롬프트 1회에 묶을 최대 날짜 수
+# (컨텍스트 길이 + 출력 길이에 비례하는 생성 시간/잘림 위험을 고려해 작게 유지)
+BATCH_MAX_DATES = 5
+
+# 날짜별 동시 호출(--concurrent) 시 최대 동시 요청 수 (OpenAI rate limit 여유 확보)
+LLM_MAX_CONCURRENCY = 8
+
+# LLM 응답 캐시(llm_cache) 유효기간: 같은 (model, prompt)는 이 기간 동안 재호출하지 않음
+LLM_CACHE_TTL_DAYS = 7
+
+SYSTEM_PROMPT = "당신은 데이터 마트 기반 KPI 운영 인사이트를 작성하는 분석가입니다."
+
+# risk_level 판단 기준 키워드 (프롬프트의 risk_level 규칙에 사용)
+RISK_MEDIUM_KEYWORDS = ["급락", "장애", "오류", "폭증", "실패율", "anomaly", "이상"]
+RISK_HIGH_KEYWORDS = ["중단", "결제 불가", "치명", "대규모", "심각"]
+
+HEADLINE_MAX_LEN = 180
+DEFAULT_HEADLINE = "Daily KPI Insight"
+
+# Structured Outputs 스키마: headline / risk_level 을 모델이 직접 채움 (md 정규식 파싱 불필요)
+# - strict 모드는 maxLength 미지원 → headline 길이는 저장 전 HEADLINE_MAX_LEN으로 자름
+_INSIGHT_PROPERTIES = {
+    "headline": {"type": "string"},
+    "risk_level": {"type": "string", "enum": ["LOW", "MEDIUM", "HIGH"]},
+    "summary_md": {"type": "string"},
+}
+INSIGHT_JSON_SCHEMA = {
+    "type": "object",
+    "properties": _INSIGHT_PROPERTIES,
+    "required": list(_INSIGHT_PROPERTIES),
+    "additionalProperties": False,
+}
+# 배치 프롬프트용: 날짜별 insight 배열 (루트는 object여야 함)
+_BATCH_ITEM_PROPERTIES = {"event_date": {"type": "string"}, **_INSIGHT_PROPERTIES}
+BATCH_INSIGHT_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "insights": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": _BATCH_ITEM_PROPERTIES,
+                "required": list(_BATCH_ITEM_PROPERTIES),
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["insights"],
+    "additionalProperties": False,
+}
+
+
+# -------------------------------------------------
+# Clients (프로세스 단위 캐시)
+# -------------------------------------------------
+def _api_key() -> str:
+    """.env 로드 후 OPENAI_API_KEY 반환 (없으면 예외)"""
+    load_dotenv(PROJECT_ROOT / ".env")
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY가 없습니다. 프로젝트 루트의 .env를 확인하세요.")
+    return api_key
+
+
+@lru_cache(maxsize=1)
+def _client() -> OpenAI:
+    """
+    OpenAI 클라이언트를 1회만 생성해 재사용한다.
+    - .env 로드 / HTTP 커넥션 풀(TLS 핸드셰이크)을 호출마다 반복하지 않음
+    - 키가 없으면 예외 → lru_cache는 예외를 캐시하지 않으므로 .env 수정 후 재시도 가능
+    """
+    return OpenAI(api_key=_api_key())
+
+
+@lru_cache(maxsize=None)
+def _duckdb(path: str) -> duckdb.DuckDBPyConnection:
+    """
+    DuckDB 파일 연결을 경로별로 1회만 연다.
+    - 멀티스레드 서버에서는 호출마다 _duckdb(path).cursor()로 스레드별 핸들을 사용
+    """
+    return duckdb.connect(path)
+
 
 # -------------------------------------------------
 # Date Helpers
@@ -52,12 +142,6 @@ def yyyymmdd(date_str: str) -> str:
     return date_str.replace("-", "")
 
 
-def _date_minus(date_str: str, days: int) -> str:
-    """date_str에서 days만큼 이전 날짜를 YYYY-MM-DD로 반환"""
-    dt = datetime.strptime(date_str, "%Y-%m-%d").date()
-    return (dt - timedelta(days=days)).strftime("%Y-%m-%d")
-
-
 # -------------------------------------------------
 # KPI Fetch
 # -------------------------------------------------
@@ -68,122 +152,96 @@ def fetch_kpis(con: duckdb.DuckDBPyConnection, date_str: str) -> dict:
     - 전일 KPI(해당 date-1) 핵심 지표
     - 최근 7일(오늘 제외) 평균 지표
 
+    구현:
+    - 8일치(date-7 ~ date)만 한 번 스캔해 날짜별로 집계한 뒤,
+      FILTER 조건부 집계로 today / yday / w7 값을 단일 row로 뽑는다.
+      (쿼리 3번 → 1번: 플래닝/스캔 비용 절감)
+    - 컬럼 alias prefix(today_/yday_/w7_)로 결과 dict를 나눈다.
+    - 결과는 fetch_arrow_table()로 받아 dict 변환 (컬럼 목록 하드코딩 없음, 벡터화 export 경로)
+      -> 카운트 SUM은 BIGINT로 CAST (HUGEINT는 Arrow에서 decimal128 → Decimal로 변환되므로)
+
     주의:
-    - 현재 스키마에서 event_date는 VARCHAR로 저장됨
-      => 날짜 비교는 문자열 비교로 처리해야 함 (WHERE event_date = ?)
+    - mart의 event_date는 DATE 타입
+      => 파라미터도 date 객체로 바인딩해 DATE끼리 비교 (문자열 비교/암묵 CAST 없음)
+      => mart가 event_date 순으로 정렬 저장되어 있어 8일 범위 밖 row group은 zonemap으로 스킵됨
     """
-
-    # -------------------------
-    # Today: 해당 날짜 KPI
-    # -------------------------
-    today = con.execute(
+    # 날짜 파싱은 1회만: 전일/7일 전은 같은 date 객체에서 계산 (라벨은 isoformat)
+    day = datetime.strptime(date_str, "%Y-%m-%d").date()
+    d1 = day - timedelta(days=1)
+    d7 = day - timedelta(days=7)
+    yday_str = d1.isoformat()
+    d7_start = d7.isoformat()
+
+    tbl = con.execute(
         """
-        SELECT
-          event_date,
-          SUM(impressions) AS impressions,
-          SUM(clicks) AS clicks,
-          SUM(conversions) AS conversions,
-          AVG(ctr) AS ctr,
-          AVG(cvr) AS cvr,
-          SUM(ad_cost) AS ad_cost,
-          SUM(ad_revenue) AS ad_revenue,
-          SUM(payments_total) AS payments_total,
-          SUM(payments_success) AS payments_success,
-          SUM(payments_failed) AS payments_failed,
-          AVG(payment_success_rate) AS payment_success_rate,
-          SUM(pay_amount_success) AS pay_amount_success
-        FROM mart.daily_campaign_kpi
-        WHERE event_date = ?
-        GROUP BY event_date
-        """,
-        [date_str],
-    ).fetchone()
-
-    if not today:
-        raise RuntimeError(
-            f"[LLM] No KPI row found for date={date_str}. "
-            "먼저 파이프라인 실행으로 mart를 생성하세요."
-        )
-
-    cols = [
-        "event_date",
-        "impressions", "clicks", "conversions", "ctr", "cvr",
-        "ad_cost", "ad_revenue",
-        "payments_total", "payments_success", "payments_failed", "payment_success_rate",
-        "pay_amount_success"
-    ]
-    today_dict = dict(zip(cols, today))
-
-    # -------------------------
-    # Yesterday: 전일 KPI 요약
-    # -------------------------
-    yday_str = _date_minus(date_str, 1)
-    yday = con.execute(
-        """
-        SELECT
-          SUM(ad_revenue) AS ad_revenue,
-          SUM(ad_cost) AS ad_cost,
-          SUM(payments_failed) AS payments_failed,
-          AVG(payment_success_rate) AS payment_success_rate,
-          SUM(clicks) AS clicks,
-          SUM(conversions) AS conversions
-        FROM mart.daily_campaign_kpi
-        WHERE event_date = ?
-        """,
-        [yday_str],
-    ).fetchone()
-
-    # -------------------------
-    # Last 7 days avg: (오늘 제외)
-    # -------------------------
-    d7_start = _date_minus(date_str, 7)
-    d1 = _date_minus(date_str, 1)
-
-    w7 = con.execute(
-        """
-        SELECT
-          AVG(ad_revenue) AS avg_ad_revenue,
-          AVG(ad_cost) AS avg_ad_cost,
-          AVG(payments_failed) AS avg_payments_failed,
-          AVG(payment_success_rate) AS avg_payment_success_rate,
-          AVG(clicks) AS avg_clicks,
-          AVG(conversions) AS avg_conversions
-        FROM (
+        WITH daily AS (
           SELECT
             event_date,
-            SUM(ad_revenue) AS ad_revenue,
+            SUM(impressions)::BIGINT AS impressions,
+            SUM(clicks)::BIGINT AS clicks,
+            SUM(conversions)::BIGINT AS conversions,
+            AVG(ctr) AS ctr,
+            AVG(cvr) AS cvr,
             SUM(ad_cost) AS ad_cost,
-            SUM(payments_failed) AS payments_failed,
+            SUM(ad_revenue) AS ad_revenue,
+            SUM(payments_total)::BIGINT AS payments_total,
+            SUM(payments_success)::BIGINT AS payments_success,
+            SUM(payments_failed)::BIGINT AS payments_failed,
             AVG(payment_success_rate) AS payment_success_rate,
-            SUM(clicks) AS clicks,
-            SUM(conversions) AS conversions
+            SUM(pay_amount_success) AS pay_amount_success
           FROM mart.daily_campaign_kpi
-          WHERE event_date BETWEEN ? AND ?
+          WHERE event_date BETWEEN $d7 AND $today
           GROUP BY event_date
         )
+        SELECT
+          -- Today: 해당 날짜 KPI
+          ANY_VALUE(event_date) FILTER (WHERE event_date = $today) AS today_event_date,
+          ANY_VALUE(impressions) FILTER (WHERE event_date = $today) AS today_impressions,
+          ANY_VALUE(clicks) FILTER (WHERE event_date = $today) AS today_clicks,
+          ANY_VALUE(conversions) FILTER (WHERE event_date = $today) AS today_conversions,
+          ANY_VALUE(ctr) FILTER (WHERE event_date = $today) AS today_ctr,
+          ANY_VALUE(cvr) FILTER (WHERE event_date = $today) AS today_cvr,
+          ANY_VALUE(ad_cost) FILTER (WHERE event_date = $today) AS today_ad_cost,
+          ANY_VALUE(ad_revenue) FILTER (WHERE event_date = $today) AS today_ad_revenue,
+          ANY_VALUE(payments_total) FILTER (WHERE event_date = $today) AS today_payments_total,
+          ANY_VALUE(payments_success) FILTER (WHERE event_date = $today) AS today_payments_success,
+          ANY_VALUE(payments_failed) FILTER (WHERE event_date = $today) AS today_payments_failed,
+          ANY_VALUE(payment_success_rate) FILTER (WHERE event_date = $today) AS today_payment_success_rate,
+          ANY_VALUE(pay_amount_success) FILTER (WHERE event_date = $today) AS today_pay_amount_success,
+
+          -- Yesterday: 전일 KPI 요약
+          ANY_VALUE(ad_revenue) FILTER (WHERE event_date = $d1) AS yday_ad_revenue,
+          ANY_VALUE(ad_cost) FILTER (WHERE event_date = $d1) AS yday_ad_cost,
+          ANY_VALUE(payments_failed) FILTER (WHERE event_date = $d1) AS yday_payments_failed,
+          ANY_VALUE(payment_success_rate) FILTER (WHERE event_date = $d1) AS yday_payment_success_rate,
+          ANY_VALUE(clicks) FILTER (WHERE event_date = $d1) AS yday_clicks,
+          ANY_VALUE(conversions) FILTER (WHERE event_date = $d1) AS yday_conversions,
+
+          -- Last 7 days avg: (오늘 제외)
+          AVG(ad_revenue) FILTER (WHERE event_date BETWEEN $d7 AND $d1) AS w7_avg_ad_revenue,
+          AVG(ad_cost) FILTER (WHERE event_date BETWEEN $d7 AND $d1) AS w7_avg_ad_cost,
+          AVG(payments_failed) FILTER (WHERE event_date BETWEEN $d7 AND $d1) AS w7_avg_payments_failed,
+          AVG(payment_success_rate) FILTER (WHERE event_date BETWEEN $d7 AND $d1) AS w7_avg_payment_success_rate,
+          AVG(clicks) FILTER (WHERE event_date BETWEEN $d7 AND $d1) AS w7_avg_clicks,
+          AVG(conversions) FILTER (WHERE event_date BETWEEN $d7 AND $d1) AS w7_avg_conversions
+        FROM daily
         """,
-        [d7_start, d1],
-    ).fetchone()
+        {"today": day, "d1": d1, "d7": d7},
+    ).fetch_arrow_table()
+    row = tbl.to_pylist()[0]
 
-    yday_dict = {
-        "date": yday_str,
-        "ad_revenue": yday[0] if yday else None,
-        "ad_cost": yday[1] if yday else None,
-        "payments_failed": yday[2] if yday else None,
-        "payment_success_rate": yday[3] if yday else None,
-        "clicks": yday[4] if yday else None,
-        "conversions": yday[5] if yday else None,
-    }
+    if row["today_event_date"] is None:
+        raise RuntimeError(
+            f"[LLM] No KPI row found for date={date_str}. "
+            "먼저 파이프라인 실행으로 mart를 생성하세요."
+        )
 
-    w7_dict = {
-        "range": f"{d7_start}~{d1}",
-        "avg_ad_revenue": w7[0] if w7 else None,
-        "avg_ad_cost": w7[1] if w7 else None,
-        "avg_payments_failed": w7[2] if w7 else None,
-        "avg_payment_success_rate": w7[3] if w7 else None,
-        "avg_clicks": w7[4] if w7 else None,
-        "avg_conversions": w7[5] if w7 else None,
-    }
+    def _section(prefix: str) -> dict:
+        return {k[len(prefix):]: v for k, v in row.items() if k.startswith(prefix)}
+
+    today_dict = _section("today_")
+    yday_dict = {"date": yday_str, **_section("yday_")}
+    w7_dict = {"range": f"{d7_start}~{yday_str}", **_section("w7_")}
 
     return {"today": today_dict, "yday": yday_dict, "w7": w7_dict}
 
@@ -204,12 +262,10 @@ def pct_change(curr: float | None, prev: float | None) -> str:
         return "N/A"
 
 
-def build_prompt(payload: dict) -> str:
+def _kpi_context(payload: dict) -> str:
     """
-    LLM 프롬프트 구성 원칙:
-    - '운영' 관점(관측/가설/확인/액션)으로 구조화
-    - 출력 포맷을 고정하여 결과 안정화
-    - 데이터는 "오늘/전일/7일평균 + 변화율"로 최소 충분 컨텍스트만 제공
+    프롬프트의 데이터 블록(오늘/전일/7일평균 + 변화율).
+    - 단건(build_prompt) / 배치(build_batch_prompt) 프롬프트가 공유
     """
     t = payload["today"]
     y = payload["yday"]
@@ -224,10 +280,7 @@ def build_prompt(payload: dict) -> str:
         "payments_failed_vs_w7": pct_change(t["payments_failed"], w["avg_payments_failed"]),
     }
 
-    prompt = f"""
-당신은 결제/광고 KPI를 운영 관점에서 요약하는 데이터 분석가입니다.
-아래 데이터는 특정 날짜의 집계 KPI와 전일/최근 7일 평균 비교입니다.
-
+    return f"""
 [오늘 KPI]
 - date: {t["event_date"]}
 - impressions: {t["impressions"]}
@@ -267,14 +320,13 @@ def build_prompt(payload: dict) -> str:
 - payment_success_rate vs yday: {diff["pay_success_rate_vs_yday"]}
 - ad_revenue vs 7d avg: {diff["ad_revenue_vs_w7"]}
 - payments_failed vs 7d avg: {diff["payments_failed_vs_w7"]}
+""".strip()
 
-요구사항:
-- 아래 출력 포맷을 반드시 지켜서 한국어로 작성하세요.
-- 애매한 부분은 '가설'로 명시하고, 확정적 단정은 피하세요.
-- 운영 액션은 '측정 가능'하게 작성하세요. (예: "결제 실패율 X% 이하로", "특정 캠페인 확인", "로그 필드 추가" 등)
 
-[출력 포맷]
-# Daily Insight ({t["event_date"]})
+def _output_format(date_label: str) -> str:
+    """고정 출력 포맷 (날짜별 섹션은 '# Daily Insight (YYYY-MM-DD)' 제목으로 시작)"""
+    return f"""
+# Daily Insight ({date_label})
 
 ## 1) 오늘 요약 (3줄)
 - ...
@@ -297,153 +349,462 @@ def build_prompt(payload: dict) -> str:
 - ...
 """.strip()
 
+
+_REQUIREMENTS = """
+요구사항:
+- 아래 출력 포맷을 반드시 지켜서 한국어로 작성하세요.
+- 애매한 부분은 '가설'로 명시하고, 확정적 단정은 피하세요.
+- 운영 액션은 '측정 가능'하게 작성하세요. (예: "결제 실패율 X% 이하로", "특정 캠페인 확인", "로그 필드 추가" 등)
+""".strip()
+
+_JSON_FIELDS = f"""
+응답 JSON 필드:
+- headline: '오늘 요약'의 핵심 한 문장 ({HEADLINE_MAX_LEN}자 이내)
+- risk_level: HIGH({", ".join(RISK_HIGH_KEYWORDS)} 수준) / MEDIUM({", ".join(RISK_MEDIUM_KEYWORDS)} 등 이상 징후) / LOW(그 외)
+- summary_md: 아래 출력 포맷을 따른 Markdown 본문 전체
+""".strip()
+
+
+def build_prompt(payload: dict) -> str:
+    """
+    LLM 프롬프트 구성 원칙:
+    - '운영' 관점(관측/가설/확인/액션)으로 구조화
+    - 출력 포맷을 고정하여 결과 안정화
+    - 데이터는 "오늘/전일/7일평균 + 변화율"로 최소 충분 컨텍스트만 제공
+    """
+    prompt = f"""
+당신은 결제/광고 KPI를 운영 관점에서 요약하는 데이터 분석가입니다.
+아래 데이터는 특정 날짜의 집계 KPI와 전일/최근 7일 평균 비교입니다.
+
+{_kpi_context(payload)}
+
+{_REQUIREMENTS}
+
+{_JSON_FIELDS}
+
+[출력 포맷]
+{_output_format(payload["today"]["event_date"])}
+""".strip()
+
     return prompt
 
 
+def build_batch_prompt(payloads: list[dict]) -> str:
+    """
+    여러 날짜를 1회 호출로 처리하는 배치 프롬프트.
+    - 날짜별 데이터 블록을 '### DATE YYYY-MM-DD' 구분자로 나열
+    - 출력은 BATCH_INSIGHT_JSON_SCHEMA의 insights 배열 (날짜별 항목 1개, event_date로 매칭)
+    - system/요구사항/포맷 토큰을 날짜 수만큼 반복하지 않아 호출 수와 입력 토큰이 줄어듦
+    """
+    blocks = "\n\n".join(
+        f"### DATE {p['today']['event_date']}\n{_kpi_context(p)}" for p in payloads
+    )
+
+    prompt = f"""
+당신은 결제/광고 KPI를 운영 관점에서 요약하는 데이터 분석가입니다.
+아래 데이터는 {len(payloads)}개 날짜 각각의 집계 KPI와 전일/최근 7일 평균 비교입니다.
+날짜별로 서로 독립적으로 분석하세요.
+
+{blocks}
+
+{_REQUIREMENTS}
+- insights 배열에 날짜마다 항목을 하나씩, 입력 순서대로 작성하세요.
+- 각 항목의 event_date는 해당 데이터 블록의 날짜(YYYY-MM-DD)입니다.
+
+{_JSON_FIELDS}
+
+[출력 포맷] (summary_md, 날짜별로 작성)
+{_output_format("YYYY-MM-DD")}
+""".strip()
+
+    return prompt
+
+
+def _insight_from(data: dict) -> dict:
+    """
+    Structured Outputs 항목 → {headline, risk_level, summary_md}
+    - headline은 HEADLINE_MAX_LEN으로 자르고, 비어 있으면 DEFAULT_HEADLINE
+    """
+    return {
+        "headline": data["headline"].strip()[:HEADLINE_MAX_LEN] or DEFAULT_HEADLINE,
+        "risk_level": data["risk_level"],
+        "summary_md": data["summary_md"],
+    }
+
+
+def parse_insight(content: str) -> dict:
+    """단건 응답(JSON) → insight dict"""
+    return _insight_from(json.loads(content))
+
+
+def parse_batch_insights(content: str) -> dict[str, dict]:
+    """배치 응답(JSON) → {event_date: insight}"""
+    return {item["event_date"]: _insight_from(item) for item in json.loads(content)["insights"]}
+
+
 # -------------------------------------------------
 # OpenAI Call
 # -------------------------------------------------
-def call_llm(prompt: str) -> str:
+def _model() -> str:
+    return os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+
+def _messages(prompt: str) -> list[dict]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _response_format(name: str, schema: dict) -> dict:
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "schema": schema, "strict": True},
+    }
+
+
+def call_llm(
+    prompt: str,
+    schema: dict = INSIGHT_JSON_SCHEMA,
+    *,
+    cache_con: duckdb.DuckDBPyConnection | None = None,
+) -> str:
     """
-    OpenAI API 호출.
-    - .env에서 OPENAI_API_KEY / OPENAI_MODEL 로드
+    OpenAI API 호출 (Structured Outputs, JSON 문자열 반환).
+    - 클라이언트는 _client()로 재사용 (.env의 OPENAI_API_KEY / OPENAI_MODEL)
     - temperature 낮게(0.2) 설정해 출력 안정화
+    - response_format=json_schema → headline/risk_level/summary_md 를 필드로 받음
+      (파싱은 parse_insight / parse_batch_insights)
+    - cache_con이 있으면 llm_cache를 먼저 조회 (리런/백필 시 API 호출 생략)
+      (cache_con에는 ensure_llm_cache_table이 이미 실행돼 있어야 함)
     """
-    load_dotenv(PROJECT_ROOT / ".env")
+    model = _model()
+    key = None
+    if cache_con is not None:
+        key = _cache_key(model, prompt)
+        cached = _cache_get(cache_con, key)
+        if cached is not None:
+            return cached
+
+    resp = _client().chat.completions.create(
+        model=model,
+        temperature=0.2,
+        messages=_messages(prompt),
+        response_format=_response_format("insight", schema),
+    )
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY가 없습니다. 프로젝트 루트의 .env를 확인하세요.")
+    content = resp.choices[0].message.content or ""
+    if key is not None and content.strip():
+        _cache_put(cache_con, key, model, content)
+    return content
 
-    client = OpenAI(api_key=api_key)
 
-    resp = client.chat.completions.create(
-        model=model,
+async def call_llm_async(prompt: str, client: AsyncOpenAI) -> str:
+    """
+    call_llm의 비동기 버전 (run_dates에서 날짜별 요청을 동시에 보낼 때 사용)
+    """
+    resp = await client.chat.completions.create(
+        model=_model(),
         temperature=0.2,
-        messages=[
-            {"role": "system", "content": "당신은 데이터 마트 기반 KPI 운영 인사이트를 작성하는 분석가입니다."},
-            {"role": "user", "content": prompt},
-        ],
+        messages=_messages(prompt),
+        response_format=_response_format("insight", INSIGHT_JSON_SCHEMA),
     )
     return resp.choices[0].message.content or ""
 
 
 # -------------------------------------------------
-# Storage: DuckDB + Markdown
+# LLM Response Cache (DuckDB)
 # -------------------------------------------------
-def ensure_insight_table(con: duckdb.DuckDBPyConnection) -> None:
+def ensure_llm_cache_table(con: duckdb.DuckDBPyConnection) -> None:
     """
-    결과를 저장할 테이블 보장.
-    - event_date 기준으로 재실행 시 중복 방지 필요(아래 save_outputs에서 처리)
+    (model, prompt) 해시 → 응답 캐시 테이블 보장.
+    - 동일 날짜 재실행/백필 시 같은 프롬프트면 OpenAI 호출 없이 PK 조회 1번으로 응답 재사용
     """
     con.execute(
         """
-        CREATE TABLE IF NOT EXISTS mart_daily_insight (
-          event_date VARCHAR,
-          headline VARCHAR,
-          risk_level VARCHAR,
-          summary_md TEXT,
+        CREATE TABLE IF NOT EXISTS llm_cache (
+          hash VARCHAR PRIMARY KEY,
+          model VARCHAR,
+          response TEXT,
           created_at TIMESTAMP
         )
         """
     )
 
 
-def extract_headline_and_risk(md: str) -> tuple[str, str]:
-    """
-    LLM 출력 md에서 Superset용 컬럼을 추출한다.
+def _cache_key(model: str, prompt: str) -> str:
+    return hashlib.sha256((model + "\x00" + prompt).encode("utf-8")).hexdigest()
 
-    간단 규칙 기반:
-    - headline: '## 1) 오늘 요약' 아래 첫 bullet을 headline로 사용
-    - risk_level: 키워드 기반 LOW/MEDIUM/HIGH 추정
-      (운영 현업에서는 rule-based risk label이 1차 triage에 유용)
-    """
-    headline = "Daily KPI Insight"
-    risk_level = "LOW"
 
-    lines = [ln.strip() for ln in md.splitlines() if ln.strip()]
+def _cache_get(con: duckdb.DuckDBPyConnection, key: str) -> str | None:
+    # llm_cache는 진입점에서 연결당 1회 ensure_llm_cache_table로 보장 (조회마다 DDL 실행하지 않음)
+    row = con.execute(
+        """
+        SELECT response FROM llm_cache
+        WHERE hash = ? AND created_at > NOW() - to_days(?)
+        """,
+        [key, LLM_CACHE_TTL_DAYS],
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _cache_put(con: duckdb.DuckDBPyConnection, key: str, model: str, response: str) -> None:
+    # 만료된 동일 키는 덮어씀
+    con.execute(
+        "INSERT OR REPLACE INTO llm_cache (hash, model, response, created_at) VALUES (?, ?, ?, NOW())",
+        [key, model, response],
+    )
+
+
+# -------------------------------------------------
+# Storage: DuckDB + Markdown
+# -------------------------------------------------
+def _sql_str(s: str) -> str:
+    return "'" + s.replace("'", "''") + "'"
+
+
+_INSIGHT_TABLE_DDL = """
+CREATE TABLE {name} (
+  event_date DATE PRIMARY KEY,
+  headline VARCHAR,
+  risk_level VARCHAR,
+  summary_md TEXT,
+  created_at TIMESTAMP
+)
+"""
+
+# 테이블 주석(COMMENT ON TABLE)에 기록하는 스키마 버전
+# - 컬럼 정의가 바뀌면 올려서 ensure_insight_table이 재생성하도록 함
+# - v6: headline / risk_level 을 Structured Outputs 값으로 저장 (이전 버전의 생성 컬럼 제거)
+# - v7: event_date VARCHAR -> DATE (다른 mart 테이블과 동일하게 DATE끼리 비교/조인)
+INSIGHT_SCHEMA_VERSION = "mart_daily_insight:v7"
 
-    # headline 추출: "오늘 요약" 섹션의 첫 bullet을 사용
-    for i, ln in enumerate(lines):
-        if ln.startswith("## 1) 오늘 요약"):
-            for j in range(i + 1, min(i + 8, len(lines))):
-                if lines[j].startswith("-"):
-                    headline = lines[j].lstrip("-").strip()
-                    break
-            break
 
-    # risk rule: 키워드 기반 간단 분류
-    text = md.lower()
-    if any(k in text for k in ["급락", "장애", "오류", "폭증", "실패율", "anomaly", "이상"]):
-        risk_level = "MEDIUM"
-    if any(k in text for k in ["중단", "결제 불가", "치명", "대규모", "심각"]):
-        risk_level = "HIGH"
+def ensure_insight_table(con: duckdb.DuckDBPyConnection) -> None:
+    """
+    결과를 저장할 테이블 보장.
+    - event_date PRIMARY KEY → save_outputs에서 ON CONFLICT upsert로 중복 방지
+    - 스키마 버전이 다른(구버전) 테이블은 재생성해 마이그레이션
+      (DuckDB는 ALTER TABLE ... ADD PRIMARY KEY / 생성 컬럼 변경 미지원)
+    """
+    row = con.execute(
+        "SELECT comment FROM duckdb_tables() WHERE schema_name = 'main' AND table_name = 'mart_daily_insight'"
+    ).fetchone()
+    if row is None:
+        con.execute(_INSIGHT_TABLE_DDL.format(name="mart_daily_insight"))
+        con.execute(f"COMMENT ON TABLE mart_daily_insight IS {_sql_str(INSIGHT_SCHEMA_VERSION)}")
+    elif row[0] != INSIGHT_SCHEMA_VERSION:
+        _migrate_insight_table(con)
 
-    return headline[:180], risk_level
+
+def _migrate_insight_table(con: duckdb.DuckDBPyConnection) -> None:
+    """
+    구버전 mart_daily_insight → 현재 스키마로 재생성.
+    - 모든 구버전이 같은 컬럼명을 가지므로 그대로 복사 (생성 컬럼이었다면 계산된 값이 저장됨)
+    - 구버전의 VARCHAR event_date('YYYY-MM-DD')는 DATE로 CAST
+    - 날짜별 최신(created_at) row만 남김 (PK 없던 버전의 중복 정리)
+    """
+    con.begin()
+    try:
+        con.execute(_INSIGHT_TABLE_DDL.format(name="mart_daily_insight_new"))
+        con.execute(
+            """
+            INSERT INTO mart_daily_insight_new (event_date, headline, risk_level, summary_md, created_at)
+            SELECT CAST(event_date AS DATE), headline, risk_level, summary_md, created_at
+            FROM mart_daily_insight
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY CAST(event_date AS DATE) ORDER BY created_at DESC) = 1
+            """
+        )
+        con.execute("DROP TABLE mart_daily_insight")
+        con.execute("ALTER TABLE mart_daily_insight_new RENAME TO mart_daily_insight")
+        con.execute(f"COMMENT ON TABLE mart_daily_insight IS {_sql_str(INSIGHT_SCHEMA_VERSION)}")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
 
 
-def save_outputs(con: duckdb.DuckDBPyConnection, date_str: str, md: str) -> Path:
+def save_outputs(con: duckdb.DuckDBPyConnection, date_str: str, insight: dict) -> Path:
     """
     저장 전략:
     1) data/reports/insight_YYYYMMDD.md 파일 저장 (운영 리뷰/리포트)
     2) DuckDB mart_daily_insight 저장 (Superset BI 활용)
 
     핵심:
-    - 동일 날짜 재실행 시 중복 row가 쌓이지 않게 DELETE → INSERT 수행
+    - 동일 날짜 재실행 시 중복 row가 쌓이지 않게 event_date PK 기준 upsert
       => idempotent batch 보장
+    - insight: parse_insight 결과 {headline, risk_level, summary_md} 를 그대로 저장
+    """
+    return save_outputs_many(con, {date_str: insight})[0]
+
+
+def save_outputs_many(con: duckdb.DuckDBPyConnection, insights: dict[str, dict]) -> list[Path]:
+    """
+    save_outputs의 다건 버전 (배치 생성 결과 저장용).
+    - 날짜별 md 파일 저장 (summary_md)
+    - INSERT ... ON CONFLICT DO UPDATE 를 executemany 1회 + 트랜잭션 1개로 처리
+    - event_date는 Python date 객체로 바인딩 (DATE 컬럼과 DATE끼리 비교)
     """
     REPORT_DIR.mkdir(parents=True, exist_ok=True)
 
     # 1) 파일 저장
-    report_path = REPORT_DIR / f"insight_{yyyymmdd(date_str)}.md"
-    report_path.write_text(md, encoding="utf-8")
+    paths = []
+    for date_str, insight in insights.items():
+        report_path = REPORT_DIR / f"insight_{yyyymmdd(date_str)}.md"
+        report_path.write_text(insight["summary_md"], encoding="utf-8")
+        paths.append(report_path)
 
     # 2) DB 저장
     ensure_insight_table(con)
-    headline, risk = extract_headline_and_risk(md)
-
-    # 중복 방지: 같은 날짜 있으면 먼저 삭제
-    con.execute(
-        "DELETE FROM mart_daily_insight WHERE event_date = ?",
-        [date_str],
-    )
+    rows = [
+        [datetime.strptime(date_str, "%Y-%m-%d").date(), i["headline"], i["risk_level"], i["summary_md"]]
+        for date_str, i in insights.items()
+    ]
 
-    # 그 다음 신규 INSERT
-    con.execute(
-        """
-        INSERT INTO mart_daily_insight (event_date, headline, risk_level, summary_md, created_at)
-        VALUES (?, ?, ?, ?, NOW())
-        """,
-        [date_str, headline, risk, md],
-    )
+    # 중복 방지: 같은 날짜가 있으면 덮어쓰기 (DELETE+INSERT 2 statement → upsert 1 statement)
+    con.begin()
+    try:
+        con.executemany(
+            """
+            INSERT INTO mart_daily_insight (event_date, headline, risk_level, summary_md, created_at)
+            VALUES (?, ?, ?, ?, NOW())
+            ON CONFLICT (event_date) DO UPDATE SET
+              headline = excluded.headline,
+              risk_level = excluded.risk_level,
+              summary_md = excluded.summary_md,
+              created_at = excluded.created_at
+            """,
+            rows,
+        )
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
 
-    return report_path
+    return paths
 
 
 # -------------------------------------------------
 # Entrypoint
 # -------------------------------------------------
+def main_batch(dates: list[str], *, use_cache: bool = True) -> list[Path]:
+    """
+    여러 날짜를 배치 프롬프트로 처리 (BATCH_MAX_DATES개씩 1회 호출).
+    - 백필 시 날짜 수만큼의 순차 HTTP 호출을 ceil(N / BATCH_MAX_DATES)회로 줄임
+    - 응답(insights 배열)을 event_date로 매칭해 단건과 동일한 파일/row 형태로 저장
+    - use_cache=False면 llm_cache를 건너뜀
+    """
+    con = _duckdb(str(DUCKDB_PATH)).cursor()
+    if use_cache:
+        ensure_llm_cache_table(con)
+
+    saved: list[Path] = []
+    missing: list[str] = []
+    for i in range(0, len(dates), BATCH_MAX_DATES):
+        chunk = dates[i:i + BATCH_MAX_DATES]
+        payloads = [fetch_kpis(con, d) for d in chunk]
+        content = call_llm(
+            build_batch_prompt(payloads),
+            BATCH_INSIGHT_JSON_SCHEMA,
+            cache_con=con if use_cache else None,
+        )
+
+        items = parse_batch_insights(content) if content.strip() else {}
+        found = {d: items[d] for d in chunk if d in items}
+        missing.extend(d for d in chunk if d not in items)
+        if found:
+            saved.extend(save_outputs_many(con, found))
+
+    if missing:
+        raise RuntimeError(f"[LLM] batch response missing sections for: {missing}")
+    return saved
+
+
+async def run_dates(dates: list[str], *, use_cache: bool = True) -> list[Path]:
+    """
+    날짜별 독립 프롬프트를 동시에 호출 (출력 길이/날짜별 결정성 때문에 배치 프롬프트가 부적합할 때).
+    - LLM 호출은 네트워크 I/O 대기 → asyncio.gather로 겹쳐서 총 대기 ≈ max(RTT)
+    - 동시 요청 수는 LLM_MAX_CONCURRENCY로 제한
+    - DuckDB 조회/저장은 단일 연결에서 동기로 처리 (호출 전 조회, 응답 수집 후 한 번에 저장)
+    - llm_cache 적중 날짜는 호출 대상에서 제외
+    """
+    con = _duckdb(str(DUCKDB_PATH)).cursor()
+    if use_cache:
+        ensure_llm_cache_table(con)
+    prompts = {d: build_prompt(fetch_kpis(con, d)) for d in dates}
+
+    model = _model()
+    contents: dict[str, str] = {}
+    if use_cache:
+        for d, prompt in prompts.items():
+            cached = _cache_get(con, _cache_key(model, prompt))
+            if cached is not None:
+                contents[d] = cached
+    pending = {d: p for d, p in prompts.items() if d not in contents}
+
+    if pending:
+        sem = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+        async with AsyncOpenAI(api_key=_api_key()) as aclient:
+            async def _one(prompt: str) -> str:
+                async with sem:
+                    return await call_llm_async(prompt, aclient)
+
+            results = await asyncio.gather(*(_one(p) for p in pending.values()))
+
+        for (d, prompt), content in zip(pending.items(), results):
+            contents[d] = content
+            if use_cache and content.strip():
+                _cache_put(con, _cache_key(model, prompt), model, content)
+
+    empty = [d for d in dates if not contents[d].strip()]
+    if empty:
+        raise RuntimeError(f"[LLM] empty response for: {empty}")
+
+    return save_outputs_many(con, {d: parse_insight(contents[d]) for d in dates})
+
+
 def main() -> None:
     ap = argparse.ArgumentParser()
-    ap.add_argument("--date", required=True, help="YYYY-MM-DD")
+    g = ap.add_mutually_exclusive_group(required=True)
+    g.add_argument("--date", help="YYYY-MM-DD")
+    g.add_argument("--dates", help="YYYY-MM-DD,YYYY-MM-DD,... (기본: 배치 프롬프트로 처리)")
+    ap.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="--dates를 배치 프롬프트 대신 날짜별 호출로 동시 실행",
+    )
+    ap.add_argument("--no-cache", action="store_true", help="llm_cache를 무시하고 항상 API 호출")
     args = ap.parse_args()
+    use_cache = not args.no_cache
 
     if not DUCKDB_PATH.exists():
         raise RuntimeError(f"DuckDB 파일이 없습니다: {DUCKDB_PATH}. 먼저 build_duckdb.py를 실행하세요.")
 
-    # DuckDB 연결
-    con = duckdb.connect(str(DUCKDB_PATH))
-
+    if args.dates:
+        dates = [d.strip() for d in args.dates.split(",") if d.strip()]
+        if args.concurrent:
+            paths = asyncio.run(run_dates(dates, use_cache=use_cache))
+        else:
+            paths = main_batch(dates, use_cache=use_cache)
+        for report_path in paths:
+            print(f"[OK] LLM insight saved: {report_path}")
+        print("[OK] DuckDB table updated (idempotent): mart_daily_insight")
+        return
+
+    # DuckDB 연결 (캐시된 연결에서 cursor를 받아 사용)
+    con = _duckdb(str(DUCKDB_PATH)).cursor()
+    if use_cache:
+        ensure_llm_cache_table(con)
     # KPI 조회 → 프롬프트 생성 → LLM 호출 → 저장
     payload = fetch_kpis(con, args.date)
     prompt = build_prompt(payload)
-    md = call_llm(prompt)
+    content = call_llm(prompt, cache_con=con if use_cache else None)
 
-    if not md.strip():
+    if not content.strip():
         raise RuntimeError("[LLM] empty response")
 
-    report_path = save_outputs(con, args.date, md)
+    report_path = save_outputs(con, args.date, parse_insight(content))
     print(f"[OK] LLM insight saved: {report_path}")
     print("[OK] DuckDB table updated (idempotent): mart_daily_insight")
 
@@ -2,12 +2,16 @@
 SQL Guard (Production-ish)
 - LLM이 생성한 SQL을 실행 전에 검증/정규화
 - 목적: Text2SQL을 "안전하게" 운영하기 위한 방어 레이어
+- 구조 판단(statement 수/타입, 테이블, 컬럼, JOIN, LIMIT)은 DuckDB 파서의 AST 기준
+  (duckdb.extract_statements + json_serialize_sql)
+  -> 문자열 리터럴 안의 ; / 키워드, 서브쿼리 FROM 등 정규식이 틀리던 케이스를 정확히 처리
 
 지원/정책
 - SELECT만 허용
 - 멀티 스테이트먼트 차단 (중간 세미콜론/복수 statement)
 - 마지막 세미콜론은 자동 제거 (사용자 UX 개선)
-- 허용된 스키마/테이블만 접근 가능
+- 허용된 스키마/테이블만 접근 가능 (서브쿼리 포함 모든 테이블 참조 검사)
+- 주석(--, /* */) 차단
 - JOIN 기본 금지 (확장 가능)
 - 위험 키워드 차단 (DDL/DML, pragma, attach, copy, export 등)
 - LIMIT 없으면 자동 삽입
@@ -16,10 +20,14 @@ SQL Guard (Production-ish)
 
 from __future__ import annotations
 
+import json
 import re
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Iterable
 
+import duckdb
+
 
 class SQLGuardError(ValueError):
     """SQL Guard에서 거부할 때 사용하는 예외"""
@@ -74,6 +82,7 @@ ALLOWED_COLUMNS = {
 
 # 차단 키워드 (정규식)
 # - DuckDB 기준 위험한 것들 포함
+# - 문자열 리터럴을 제거한 SQL에 적용 (AST 검증에 더한 2차 방어선)
 BLOCK_PATTERNS = [
     r"\binsert\b",
     r"\bupdate\b",
@@ -102,13 +111,34 @@ DISALLOW_JOIN = True
 DEFAULT_LIMIT = 1000
 MAX_LIMIT = 5000
 
+# 허용되지 않은 컬럼 토큰이 이 개수 이상이면 차단
+SUSPICIOUS_TOKEN_LIMIT = 3
+
+# suspicious 토큰 검사에서 제외할 함수명/키워드
+_SQL_FN_TOKENS = frozenset({"sum", "avg", "min", "max", "count", "distinct", "case", "when", "then", "else", "end"})
+_SQL_KW_TOKENS = frozenset({"select", "from", "where", "between", "and", "or", "order", "by", "limit", "asc", "desc"})
+
+
+# =========================
+# 정규식 (모듈 로드 시 1회 컴파일)
+# =========================
+
+# BLOCK_PATTERNS를 하나의 alternation으로 합쳐 1회 스캔으로 검사
+_BLOCK_RE = re.compile("|".join(f"(?:{p})" for p in BLOCK_PATTERNS))
+# 문자열 리터럴 / 따옴표 식별자 ('' , "" 이스케이프 포함)
+_QUOTED_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+_COMMENT_RE = re.compile(r"--|/\*")
+_DIGITS_RE = re.compile(r"\d+")
+_FENCE_RE = re.compile(r"```sql\s*(.*?)```", re.IGNORECASE | re.DOTALL)
+_WS_RE = re.compile(r"\s+")
+
 
 # =========================
 # 유틸
 # =========================
 
 def _collapse_ws(s: str) -> str:
-    return re.sub(r"\s+", " ", s).strip()
+    return _WS_RE.sub(" ", s).strip()
 
 
 def strip_sql_fence(text: str) -> str:
@@ -117,7 +147,7 @@ def strip_sql_fence(text: str) -> str:
     """
     if not text:
         return ""
-    m = re.search(r"```sql\s*(.*?)```", text, flags=re.IGNORECASE | re.DOTALL)
+    m = _FENCE_RE.search(text)
     if m:
         return m.group(1).strip()
     # 백틱만 있는 경우도 제거
@@ -132,97 +162,180 @@ def normalize_sql(sql: str) -> str:
     return _collapse_ws(sql).lower()
 
 
-def _has_multi_statement(sql: str) -> bool:
+def _strip_literals(sql: str) -> str:
     """
-    멀티 스테이트먼트 감지:
-    - 끝에 하나 있는 세미콜론은 허용(제거)
-    - 중간에 세미콜론이 있으면 멀티로 간주
+    문자열 리터럴/따옴표 식별자를 빈 리터럴로 치환 (키워드/주석 검사 오탐 방지)
     """
-    # 문자열 리터럴 내 ; 는 여기서는 고려하지 않는 단순 구현(운영급은 SQL 파서 권장)
-    s = sql.strip()
-    if not s:
-        return False
-    if s.endswith(";"):
-        s = s[:-1]
-    return ";" in s
+    return _QUOTED_RE.sub("''", sql)
 
 
 def _strip_trailing_semicolon(sql: str) -> str:
-    s = sql.strip()
-    if s.endswith(";"):
-        return s[:-1].rstrip()
-    return s
+    # 끝의 ; / 공백을 모두 제거 (';;', '; ;' 처럼 여러 개여도 남기지 않음)
+    return sql.strip().rstrip("; \t\r\n")
+
 
+# =========================
+# DuckDB 파서 (AST)
+# =========================
 
-def _extract_table(norm_sql: str) -> str:
+@lru_cache(maxsize=1)
+def _parser_con() -> duckdb.DuckDBPyConnection:
     """
-    FROM 다음 토큰을 테이블로 간주
-    - FROM mart.daily_campaign_kpi
-    - FROM mart_daily_insight_latest
+    json_serialize_sql 호출 전용 in-memory 연결 (데이터 파일에 접근하지 않음)
     """
-    m = re.search(r"\bfrom\s+([a-zA-Z0-9_.]+)", norm_sql)
-    if not m:
-        raise SQLGuardError("FROM 절이 필요합니다.")
-    return m.group(1)
+    return duckdb.connect(":memory:")
 
 
-def _extract_limit(norm_sql: str) -> int | None:
-    m = re.search(r"\blimit\s+(\d+)", norm_sql)
-    if not m:
-        return None
+def _parse_select(raw_sql: str) -> dict:
+    """
+    DuckDB 파서로 단일 SELECT 문을 파싱해 최상위 query node(dict)를 반환
+    - statement가 1개가 아니면 멀티 스테이트먼트로 차단 (리터럴 안의 ; 는 파서가 구분)
+    - SELECT 이외 statement 차단
+    - 파싱 실패는 SQLGuardError로 변환
+    """
     try:
-        return int(m.group(1))
-    except Exception:
-        return None
+        stmts = duckdb.extract_statements(raw_sql)
+    except duckdb.Error as e:
+        raise SQLGuardError(f"SQL 파싱에 실패했습니다: {e}") from e
+
+    if len(stmts) != 1:
+        raise SQLGuardError("세미콜론(멀티 스테이트먼트)은 허용되지 않습니다. (끝의 ; 는 제거해서 보내주세요)")
+    if stmts[0].type != duckdb.StatementType.SELECT:
+        raise SQLGuardError("SELECT 문만 허용됩니다.")
+
+    # cursor(): 스레드별 핸들 (Streamlit 등 멀티스레드 호출 대비)
+    out = _parser_con().cursor().execute(
+        "SELECT json_serialize_sql(?::VARCHAR)", [raw_sql]
+    ).fetchone()[0]
+    tree = json.loads(out)
+    if tree.get("error"):
+        raise SQLGuardError(f"SQL 파싱에 실패했습니다: {tree.get('error_message')}")
+
+    node = tree["statements"][0]["node"]
+    if node.get("type") != "SELECT_NODE":
+        raise SQLGuardError("단일 SELECT 문만 허용됩니다. (UNION 등 집합 연산 불가)")
+    if node.get("cte_map", {}).get("map"):
+        raise SQLGuardError("WITH(CTE)는 허용되지 않습니다.")
+    return node
+
+
+def _iter_nodes(obj):
+    """AST(dict/list)를 깊이 우선으로 순회하며 모든 dict 노드를 yield"""
+    if isinstance(obj, dict):
+        yield obj
+        for v in obj.values():
+            yield from _iter_nodes(v)
+    elif isinstance(obj, list):
+        for v in obj:
+            yield from _iter_nodes(v)
 
 
-def _ensure_limit(raw_sql: str) -> str:
-    norm = normalize_sql(raw_sql)
-    if " limit " in norm:
-        # 너무 큰 limit은 안전상 제한
-        lim = _extract_limit(norm)
-        if lim is not None and lim > MAX_LIMIT:
-            # limit을 강제로 줄임
-            raw_sql = re.sub(r"(?i)\blimit\s+\d+", f"LIMIT {MAX_LIMIT}", raw_sql)
+def _table_name(ref: dict) -> str:
+    """BASE_TABLE 노드 -> 'schema.table' (schema 없으면 table)"""
+    parts = [ref.get("catalog_name"), ref.get("schema_name"), ref.get("table_name")]
+    return ".".join(p for p in parts if p).lower()
+
+
+def _extract_table(node: dict) -> str:
+    """
+    최상위 FROM 절의 단일 테이블명을 반환
+    - FROM mart.daily_campaign_kpi
+    - FROM mart_daily_insight_latest
+    - JOIN(명시/콤마 암묵 JOIN), 서브쿼리, 테이블 함수는 차단
+    """
+    ref = node.get("from_table") or {}
+    ref_type = ref.get("type")
+
+    if ref_type in (None, "EMPTY"):
+        raise SQLGuardError("FROM 절이 필요합니다.")
+    if ref_type == "JOIN":
+        if DISALLOW_JOIN:
+            raise SQLGuardError("JOIN은 허용되지 않습니다. (필요 시 사전 정의된 뷰를 사용하세요)")
+        raise SQLGuardError("JOIN 쿼리는 아직 지원하지 않습니다.")
+    if ref_type != "BASE_TABLE":
+        raise SQLGuardError(f"허용되지 않은 FROM 절입니다: {ref_type}")
+    return _table_name(ref)
+
+
+def _check_all_tables(node: dict) -> None:
+    """
+    서브쿼리(WHERE IN (SELECT ...) 등)까지 포함한 모든 테이블 참조를 allowlist로 검사
+    """
+    for n in _iter_nodes(node):
+        ref_type = n.get("type")
+        if ref_type == "BASE_TABLE":
+            name = _table_name(n)
+            if name not in ALLOWED_TABLES:
+                raise SQLGuardError(f"허용되지 않은 테이블 접근: {name}")
+        elif ref_type == "TABLE_FUNCTION":
+            raise SQLGuardError("테이블 함수(read_csv 등)는 허용되지 않습니다.")
+        elif ref_type == "JOIN" and DISALLOW_JOIN:
+            raise SQLGuardError("JOIN은 허용되지 않습니다. (필요 시 사전 정의된 뷰를 사용하세요)")
+
+
+def _extract_limit(node: dict) -> tuple[int, int] | None:
+    """
+    LIMIT 상수값과 원문 내 위치(query_location)를 반환
+    - LIMIT이 없으면 None
+    - 상수가 아닌 LIMIT(파라미터/식/퍼센트)은 차단
+    """
+    for mod in node.get("modifiers", []):
+        if mod.get("type") == "LIMIT_PERCENT_MODIFIER":
+            raise SQLGuardError("LIMIT은 정수 상수로 지정하세요.")
+        if mod.get("type") != "LIMIT_MODIFIER" or mod.get("limit") is None:
+            continue
+        lim = mod["limit"]
+        if lim.get("class") != "CONSTANT" or not isinstance(lim["value"].get("value"), int):
+            raise SQLGuardError("LIMIT은 정수 상수로 지정하세요.")
+        return lim["value"]["value"], lim["query_location"]
+    return None
+
+
+def _char_offset(raw_sql: str, byte_loc: int) -> int:
+    """AST query_location(UTF-8 바이트 오프셋) -> str 인덱스 (한글 리터럴 등 비 ASCII 대응)"""
+    if raw_sql.isascii():
+        return byte_loc
+    return len(raw_sql.encode("utf-8")[:byte_loc].decode("utf-8", errors="ignore"))
+
+
+def _ensure_limit(raw_sql: str, node: dict) -> str:
+    found = _extract_limit(node)
+    if found is not None:
+        lim, loc = found
+        if lim > MAX_LIMIT:
+            # 너무 큰 limit은 안전상 제한: AST가 알려준 위치의 숫자만 교체
+            m = _DIGITS_RE.match(raw_sql, _char_offset(raw_sql, loc))
+            if m is None:
+                raise SQLGuardError("LIMIT 값을 해석할 수 없습니다.")
+            raw_sql = raw_sql[: m.start()] + str(MAX_LIMIT) + raw_sql[m.end():]
         return raw_sql
 
     return raw_sql.rstrip() + f" LIMIT {DEFAULT_LIMIT}"
 
 
-def _extract_selected_columns(norm_sql: str) -> list[str] | None:
+def _collect_column_refs(expr, out: list[str]) -> None:
+    for n in _iter_nodes(expr):
+        if n.get("class") == "COLUMN_REF":
+            # 한정자(kpi.ctr)는 마지막 이름만 컬럼으로 사용
+            out.append(n["column_names"][-1].lower())
+
+
+def _extract_selected_columns(node: dict) -> list[str] | None:
     """
-    아주 단순한 컬럼 추출:
-    - SELECT a, b, SUM(c) AS x ...
+    SELECT 리스트에서 참조하는 컬럼명 추출 (AST의 COLUMN_REF 기준)
+    - SELECT a, b, SUM(c) AS x ... -> [a, b, c]
     - '*' 사용이면 None 반환(검증 불가 -> 허용/거부 정책 선택 가능)
     """
-    # SELECT ... FROM 사이를 뽑는다
-    m = re.search(r"\bselect\s+(.*?)\s+\bfrom\b", norm_sql)
-    if not m:
+    select_list = node.get("select_list", [])
+    if any(e.get("class") == "STAR" for e in select_list):
         return None
-    select_part = m.group(1).strip()
-    if select_part == "*" or select_part.startswith("* "):
-        return None
-
-    # 쉼표로 나누되, 함수 괄호 내부 쉼표는 단순 무시(완벽하지 않음)
-    parts = [p.strip() for p in select_part.split(",")]
 
     cols: list[str] = []
-    for p in parts:
-        # AS 별칭 제거
-        p = re.sub(r"\bas\s+[a-zA-Z0-9_]+\b", "", p).strip()
-        # 함수/연산이면 컬럼명만 최대한 뽑기
-        # 예: sum(ad_revenue) -> ad_revenue
-        inner = re.findall(r"[a-zA-Z_][a-zA-Z0-9_]*", p)
-        # inner에는 select 키워드/함수명도 섞일 수 있음, 여기서는 "컬럼 후보"만 추정
-        # 너무 공격적으로 막지 않기 위해 그냥 반환만 하고, allowlist는 완화 적용
-        cols.extend(inner)
-
-    # 중복 제거
-    uniq = []
-    for c in cols:
-        if c not in uniq:
-            uniq.append(c)
-    return uniq
+    for expr in select_list:
+        _collect_column_refs(expr, cols)
+
+    # 중복 제거 (순서 유지)
+    return list(dict.fromkeys(cols))
 
 
 # =========================
@@ -240,51 +353,53 @@ def validate_sql(sql_or_text: str) -> str:
     raw = strip_sql_fence(sql_or_text)
     raw = raw.strip()
 
-    # 멀티 스테이트먼트 차단 (끝 ; 하나는 허용)
-    if _has_multi_statement(raw):
-        raise SQLGuardError("세미콜론(멀티 스테이트먼트)은 허용되지 않습니다. (끝의 ; 는 제거해서 보내주세요)")
-
     # 끝 세미콜론은 UX상 자동 제거
     raw = _strip_trailing_semicolon(raw)
+    if not raw:
+        raise SQLGuardError("빈 SQL은 허용되지 않습니다.")
 
-    norm = normalize_sql(raw)
+    # 주석 차단 (리터럴 안의 -- 는 제외)
+    # - 뒤에 붙이는 LIMIT이 주석 처리되는 등 "검증한 SQL ≠ 실행 SQL"이 되는 것을 방지
+    if _COMMENT_RE.search(_strip_literals(raw)):
+        raise SQLGuardError("SQL 주석(--, /* */)은 허용되지 않습니다.")
 
-    # SELECT만 허용
+    # 멀티 스테이트먼트 / SELECT 외 statement 차단 + AST 확보
+    node = _parse_select(raw)
+
+    norm = normalize_sql(_strip_literals(raw))
+
+    # SELECT만 허용 (DuckDB의 FROM-first 문법 등도 차단)
     if not norm.startswith("select "):
         raise SQLGuardError("SELECT 문만 허용됩니다.")
 
-    # JOIN 금지
-    if DISALLOW_JOIN and re.search(r"\bjoin\b", norm):
-        raise SQLGuardError("JOIN은 허용되지 않습니다. (필요 시 사전 정의된 뷰를 사용하세요)")
-
-    # 위험 키워드 차단
-    for pat in BLOCK_PATTERNS:
-        if re.search(pat, norm):
-            raise SQLGuardError("DDL/DML 또는 위험한 키워드가 감지되어 차단되었습니다.")
+    # 위험 키워드 차단 (단일 alternation 정규식 1회 검사)
+    if _BLOCK_RE.search(norm):
+        raise SQLGuardError("DDL/DML 또는 위험한 키워드가 감지되어 차단되었습니다.")
 
-    # 테이블 검증
-    table = _extract_table(norm)
+    # 테이블 검증 (JOIN 금지 포함)
+    table = _extract_table(node)
     if table not in ALLOWED_TABLES:
         raise SQLGuardError(f"허용되지 않은 테이블 접근: {table}")
+    _check_all_tables(node)
 
     # 컬럼 allowlist(완화 옵션)
     allowed_cols = ALLOWED_COLUMNS.get(table)
     if allowed_cols is not None:
-        selected = _extract_selected_columns(norm)
+        selected = _extract_selected_columns(node)
         # '*' 인 경우: 운영에서는 막는게 안전하지만, 지금은 UX 위해 허용하되 경고만(앱에서 표시)
         # -> Guard 레벨에서 막고 싶다면 아래를 raise로 바꾸세요.
         # if selected is None: raise SQLGuardError("SELECT * 는 허용되지 않습니다. 필요한 컬럼을 명시하세요.")
         if selected is not None:
-            # selected에 함수명(sum, avg 등)이 섞일 수 있어, "허용 컬럼이 하나라도 포함되는지" 완화 체크
+            # selected는 AST의 컬럼 참조만 담지만, 별칭 재참조 등 예외가 있어 완화 체크 유지
             # 너무 엄격하게 하면 LLM 출력이 자주 막힙니다.
             # 여기서는 "허용되지 않은 명확한 컬럼 토큰"만 차단하는 방식으로 구현
             suspicious = []
             for token in selected:
                 # 함수명/키워드는 제외
-                if token in {"sum", "avg", "min", "max", "count", "distinct", "case", "when", "then", "else", "end"}:
+                if token in _SQL_FN_TOKENS:
                     continue
                 # 테이블명이 토큰에 들어오기도 해서 제외
-                if token in {"select", "from", "where", "between", "and", "or", "order", "by", "limit", "asc", "desc"}:
+                if token in _SQL_KW_TOKENS:
                     continue
 
                 # 컬럼이 아니라 테이블명일 수도 있음
@@ -293,15 +408,16 @@ def validate_sql(sql_or_text: str) -> str:
 
                 if token not in allowed_cols:
                     # 너무 공격적으로 막지 않기 위해, "명백히 컬럼처럼 보이는 토큰"만 수집
-                    # (숫자/날짜는 이미 정규식에서 제외됨)
+                    # (숫자/날짜 리터럴은 AST에서 COLUMN_REF가 아니므로 포함되지 않음)
                     suspicious.append(token)
 
-            # suspicious가 너무 많이 나오면 차단
-            # (LLM이 이상한 컬럼을 만들거나 system table 접근 시도할 때 잡힘)
-            if len(suspicious) >= 3:
-                raise SQLGuardError(f"허용되지 않은 컬럼/토큰이 다수 감지되었습니다: {sorted(set(suspicious))[:10]}")
+                    # suspicious가 너무 많이 나오면 차단 (임계치 도달 즉시 중단)
+                    # (LLM이 이상한 컬럼을 만들거나 system table 접근 시도할 때 잡힘)
+                    # selected는 이미 중복 제거되어 있어 len(suspicious)가 곧 고유 토큰 수
+                    if len(suspicious) >= SUSPICIOUS_TOKEN_LIMIT:
+                        raise SQLGuardError(f"허용되지 않은 컬럼/토큰이 다수 감지되었습니다: {sorted(suspicious)}")
 
     # LIMIT 보장
-    raw = _ensure_limit(raw)
+    raw = _ensure_limit(raw, node)
 
     return raw
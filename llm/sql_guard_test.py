@@ -27,6 +27,14 @@ def run_one(name: str, sql: str, should_pass: bool) -> None:
             raise AssertionError("원래 통과해야 하는데 막혔습니다.") from e
 
 
+def run_expect(name: str, sql: str, expected: str) -> None:
+    print(f"\n=== {name} ===")
+    out = validate_sql(sql)
+    print("[PASS] validated SQL =>", out)
+    if out != expected:
+        raise AssertionError(f"기대값과 다릅니다: {expected}")
+
+
 def main() -> None:
     # ✅ 통과해야 하는 케이스
     run_one(
@@ -41,6 +49,39 @@ def main() -> None:
         should_pass=True,
     )
 
+    # 끝 세미콜론이 여러 개여도 모두 제거되고 LIMIT이 붙어야 함
+    run_expect(
+        "ok_double_trailing_semicolon",
+        "SELECT * FROM mart.daily_campaign_kpi ;;",
+        "SELECT * FROM mart.daily_campaign_kpi LIMIT 1000",
+    )
+
+    run_expect(
+        "ok_spaced_trailing_semicolons",
+        "SELECT * FROM mart.daily_campaign_kpi ; ;",
+        "SELECT * FROM mart.daily_campaign_kpi LIMIT 1000",
+    )
+
+    # AST query_location은 UTF-8 바이트 오프셋: 한글 리터럴이 있어도 큰 LIMIT을 MAX_LIMIT으로 교체
+    run_expect(
+        "ok_non_ascii_literal_with_large_limit",
+        "SELECT event_date, campaign_id FROM mart.daily_campaign_kpi WHERE campaign_id = '캠페인' LIMIT 99999",
+        "SELECT event_date, campaign_id FROM mart.daily_campaign_kpi WHERE campaign_id = '캠페인' LIMIT 5000",
+    )
+
+    # 문자열 리터럴 안의 ; / 키워드 / 주석 기호는 구조 판단(AST)에 영향 없음
+    run_one(
+        "ok_semicolon_in_literal",
+        "SELECT event_date, campaign_id FROM mart.daily_campaign_kpi WHERE campaign_id = 'a;b'",
+        should_pass=True,
+    )
+
+    run_one(
+        "ok_keywords_in_literal",
+        "SELECT event_date, campaign_id FROM mart.daily_campaign_kpi WHERE campaign_id = 'DROP TABLE x -- UNION JOIN'",
+        should_pass=True,
+    )
+
     # ✅ 막혀야 하는 케이스들
     run_one(
         "block_multi_statement",
@@ -78,6 +119,36 @@ def main() -> None:
         should_pass=False,
     )
 
+    run_one(
+        "block_union",
+        "SELECT event_date FROM mart.daily_campaign_kpi UNION ALL SELECT event_date FROM mart_daily_insight",
+        should_pass=False,
+    )
+
+    run_one(
+        "block_cte",
+        "WITH t AS (SELECT * FROM mart.daily_campaign_kpi) SELECT * FROM t",
+        should_pass=False,
+    )
+
+    run_one(
+        "block_from_subquery",
+        "SELECT * FROM (SELECT * FROM mart.daily_campaign_kpi) t",
+        should_pass=False,
+    )
+
+    run_one(
+        "block_table_function",
+        "SELECT * FROM read_csv_auto('data/raw/ad_events_20260219.csv')",
+        should_pass=False,
+    )
+
+    run_one(
+        "block_where_in_subquery_unknown_table",
+        "SELECT * FROM mart.daily_campaign_kpi WHERE campaign_id IN (SELECT campaign_id FROM raw.ad_events)",
+        should_pass=False,
+    )
+
     print("\n✅ ALL TESTS OK")
 
 
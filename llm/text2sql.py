@@ -5,8 +5,7 @@ Text2SQL (LLM)
 
 원칙
 - 가능한 "단일 테이블" 쿼리 유도 (JOIN 금지 정책과 호환)
-- event_date 타입/포맷 주의: DuckDB에서 DATE/TIMESTAMP/VARCHAR 가능
-  - 프로젝트에서는 mart.daily_campaign_kpi의 event_date가 DATE로 보일 수 있음(Superset 화면 기준)
+- event_date 타입/포맷 주의: mart.daily_campaign_kpi의 event_date는 DATE 타입
   - 따라서 WHERE event_date BETWEEN 'YYYY-MM-DD' AND 'YYYY-MM-DD' 형태 권장
 """
 
@@ -14,6 +13,7 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -48,6 +48,19 @@ SYSTEM_PROMPT = """
 """.strip()
 
 
+@lru_cache(maxsize=1)
+def _client() -> OpenAI:
+    """
+    OpenAI 클라이언트 1회 생성 후 재사용 (.env 로드/커넥션 풀 재사용)
+    """
+    load_dotenv(PROJECT_ROOT / ".env")
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY가 없습니다. 프로젝트 루트의 .env를 확인하세요.")
+    return OpenAI(api_key=api_key)
+
+
 @dataclass
 class Text2SQLResult:
     sql: str
@@ -59,14 +72,8 @@ def generate_sql(nl_query: str, *, model: str | None = None) -> Text2SQLResult:
     자연어 -> SQL 생성
     - SQL Guard가 후단에 있으므로, 여기서는 "좋은 SQL 생성"에 집중
     """
-    load_dotenv(PROJECT_ROOT / ".env")
-
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY가 없습니다. 프로젝트 루트의 .env를 확인하세요.")
-
+    client = _client()
     use_model = model or os.getenv("OPENAI_MODEL_TEXT2SQL", os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
-    client = OpenAI(api_key=api_key)
 
     resp = client.chat.completions.create(
         model=use_model,
@@ -3,18 +3,29 @@ DuckDB 빌더/로더 (Stage 1)
 
 역할:
 - (옵션) raw/mart 스키마 및 raw 테이블 생성(SQL 실행)
-- 특정 날짜의 CSV를 raw 테이블에 적재
+- 특정 날짜의 raw Parquet를 raw 테이블에 적재 (구버전 CSV만 있으면 Parquet로 1회 변환)
+  파이프라인에서 생성 직후 호출되면 생성기의 Arrow Table을 그대로 적재 (zero-copy Arrow scan)
 - (옵션) mart.daily_campaign_kpi 재생성
 
 주의:
-- Raw의 event_date는 VARCHAR로 설계되어 있으므로, date_str('YYYY-MM-DD') 그대로 적재/삭제합니다.
-- CSV에서 event_ts가 문자열로 읽혀도, INSERT 시 CAST로 TIMESTAMP 변환하여 타입 불일치 리스크를 줄입니다.
+- Raw의 event_date는 DATE로 저장합니다. 생성기가 Parquet에 DATE/TIMESTAMP 타입으로 기록하고,
+  삭제 조건에는 Python date 객체를 바인딩해 DATE끼리 비교합니다.
+- 구버전 CSV는 csv_to_parquet.py가 CAST(DATE/TIMESTAMP)를 적용해 같은 스키마의 Parquet로 변환합니다.
 """
 
 import argparse
+import sys
+from datetime import datetime
 from pathlib import Path
 
 import duckdb
+import pyarrow as pa
+
+# 프로젝트 루트 import 경로 확보
+# (python scripts/build_duckdb.py / python -m scripts.build_duckdb / 다른 모듈에서 import 모두 동일하게 동작)
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from scripts.csv_to_parquet import ensure_parquet_for_date
 
 
 DB_PATH = Path("data/portfolio.duckdb")
@@ -23,73 +34,126 @@ RAW_DIR = Path("data/raw")
 SQL_CREATE_RAW = Path("sql/create_raw_tables.sql")
 SQL_BUILD_MART = Path("sql/build_mart_daily_campaign_kpi.sql")
 
+MART_TABLE = "mart.daily_campaign_kpi"
 
-def to_yyyymmdd(date_str: str) -> str:
-    return date_str.replace("-", "")
+# mart 레이아웃 점검 기준
+# - DuckDB의 row group 크기는 122,880 rows 고정(테이블 단위 설정 없음) → 수만 row 단위 배치 조건은 기본값으로 충족
+# - event_date가 DATE여야 row group min/max(zonemap)로 날짜 필터 pruning 가능
+MART_EXPECTED_TYPES = {"event_date": "DATE", "campaign_id": "VARCHAR"}
 
 
 def exec_sql(con: duckdb.DuckDBPyConnection, path: Path) -> None:
     con.execute(path.read_text(encoding="utf-8"))
 
 
-def load_csv_for_date(con: duckdb.DuckDBPyConnection, date_str: str) -> None:
+def load_raw_for_date(
+    con: duckdb.DuckDBPyConnection,
+    date_str: str,
+    tables: dict[str, pa.Table] | None = None,
+) -> None:
     """
-    CSV -> raw 테이블 적재.
+    raw Parquet(또는 메모리의 Arrow Table) -> raw 테이블 적재.
+    - tables({prefix: Arrow Table})가 주어지면 con.register 로 바로 스캔 (Parquet 재읽기/압축 해제 없음)
+    - 없으면 생성기가 쓴 Parquet를 read_parquet 로 그대로 적재 (CSV 스키마 추론/문자열 파싱 없음)
+    - 구버전 CSV만 있는 날짜는 csv_to_parquet.py 로 Parquet(ZSTD)로 1회 변환 후 적재
     - 같은 날짜 데이터가 이미 있으면 DELETE 후 재적재(재실행/백필 대응)
+    - raw 이벤트에는 자연키가 없어 ON CONFLICT upsert 대신 날짜 파티션 단위 교체를 유지하되,
+      DELETE + INSERT 전체를 트랜잭션 1개로 묶어 중간 상태가 보이지 않게 함
     """
-    ds = to_yyyymmdd(date_str)
-    ad_csv = (RAW_DIR / f"ad_events_{ds}.csv").resolve()
-    pay_csv = (RAW_DIR / f"payment_events_{ds}.csv").resolve()
-
-    if not ad_csv.exists() or not pay_csv.exists():
-        raise FileNotFoundError(
-            "raw csv not found. 먼저 scripts/generate_realistic_data.py 를 실행하세요."
-        )
-
-    # 재실행 안전장치: 동일 date 제거 후 적재
-    con.execute("DELETE FROM raw.ad_events WHERE event_date = ?", [date_str])
-    con.execute("DELETE FROM raw.payment_events WHERE event_date = ?", [date_str])
-
-    # CSV -> INSERT (컬럼을 명시하여 스키마 변경/순서 이슈에 강하게)
-    # event_ts는 CSV에서 문자열일 수 있으므로 CAST로 TIMESTAMP 변환
-    con.execute(
-        f"""
-        INSERT INTO raw.ad_events
-        SELECT
-          CAST(event_date AS VARCHAR)    AS event_date,
-          CAST(event_ts AS TIMESTAMP)    AS event_ts,
-          CAST(event_type AS VARCHAR)    AS event_type,
-          CAST(campaign_id AS VARCHAR)   AS campaign_id,
-          CAST(ad_id AS VARCHAR)         AS ad_id,
-          CAST(user_id AS VARCHAR)       AS user_id,
-          CAST(device_os AS VARCHAR)     AS device_os,
-          CAST(country AS VARCHAR)       AS country,
-          CAST(cost AS DOUBLE)           AS cost,
-          CAST(revenue AS DOUBLE)        AS revenue
-        FROM read_csv_auto('{ad_csv.as_posix()}', header=true)
-        """
+    if tables is not None:
+        sources = {}
+        for prefix, tbl in tables.items():
+            con.register(f"_arrow_{prefix}", tbl)
+            sources[prefix] = f"_arrow_{prefix}"
+    else:
+        paths = ensure_parquet_for_date(date_str, RAW_DIR)
+        sources = {prefix: f"read_parquet('{path.as_posix()}')" for prefix, path in paths.items()}
+
+    # 재실행 안전장치: 동일 date 제거 후 적재 (하나의 트랜잭션)
+    day = datetime.strptime(date_str, "%Y-%m-%d").date()
+    con.begin()
+    try:
+        _replace_raw_partition(con, day, sources["ad_events"], sources["payment_events"])
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        if tables is not None:
+            for prefix in tables:
+                con.unregister(f"_arrow_{prefix}")
+
+
+def _replace_raw_partition(
+    con: duckdb.DuckDBPyConnection, day, ad_src: str, pay_src: str
+) -> None:
+    con.execute("DELETE FROM raw.ad_events WHERE event_date = ?", [day])
+    con.execute("DELETE FROM raw.payment_events WHERE event_date = ?", [day])
+
+    # 소스는 raw 테이블과 같은 컬럼 순서 (user_id 등 타입 차이는 INSERT 시 암묵 CAST)
+    con.execute(f"INSERT INTO raw.ad_events SELECT * FROM {ad_src}")
+    con.execute(f"INSERT INTO raw.payment_events SELECT * FROM {pay_src}")
+
+
+def rebuild_mart(con: duckdb.DuckDBPyConnection) -> None:
+    exec_sql(con, SQL_BUILD_MART)
+    check_mart_layout(con)
+
+
+def check_mart_layout(con: duckdb.DuckDBPyConnection) -> None:
+    """
+    mart 재생성 후 저장 레이아웃 점검.
+    - PRAGMA table_info: 필터 컬럼 타입 확인 (VARCHAR event_date면 zonemap pruning 불가)
+    - pragma_storage_info: row group 수/행 수 (메타데이터만 조회, 테이블 스캔 없음)
+    """
+    types = dict(
+        con.execute(
+            f"SELECT name, type FROM pragma_table_info('{MART_TABLE}')"
+        ).fetchall()
     )
+    for col, expected in MART_EXPECTED_TYPES.items():
+        if types.get(col) != expected:
+            raise RuntimeError(
+                f"{MART_TABLE}.{col} 타입이 {expected}가 아닙니다: {types.get(col)}"
+            )
 
-    con.execute(
+    row_groups, rows = con.execute(
         f"""
-        INSERT INTO raw.payment_events
-        SELECT
-          CAST(event_date AS VARCHAR)    AS event_date,
-          CAST(event_ts AS TIMESTAMP)    AS event_ts,
-          CAST(order_id AS VARCHAR)      AS order_id,
-          CAST(user_id AS VARCHAR)       AS user_id,
-          CAST(campaign_id AS VARCHAR)   AS campaign_id,
-          CAST(amount AS DOUBLE)         AS amount,
-          CAST(currency AS VARCHAR)      AS currency,
-          CAST(status AS VARCHAR)        AS status,
-          CAST(fail_reason AS VARCHAR)   AS fail_reason
-        FROM read_csv_auto('{pay_csv.as_posix()}', header=true)
+        SELECT COUNT(DISTINCT row_group_id), COALESCE(SUM(count), 0)
+        FROM pragma_storage_info('{MART_TABLE}')
+        WHERE column_name = 'event_date' AND segment_type = 'DATE'
         """
-    )
+    ).fetchone()
 
+    print(f"[OK] {MART_TABLE} layout: rows={rows}, row_groups={row_groups}, event_date=DATE")
 
-def rebuild_mart(con: duckdb.DuckDBPyConnection) -> None:
-    exec_sql(con, SQL_BUILD_MART)
+
+def run(
+    date_str: str,
+    *,
+    init: bool = False,
+    rebuild: bool = False,
+    tables: dict[str, pa.Table] | None = None,
+) -> None:
+    """
+    raw 적재 (+ 옵션: DDL 실행 / mart 재생성). run_daily_pipeline 에서 in-process 호출용.
+    - tables: generate_realistic_data.run() 이 돌려준 Arrow Table (없으면 raw Parquet 스캔)
+    - 연결은 함수 안에서 열고 닫음 (이후 단계가 같은 DB 파일을 열 수 있도록)
+    """
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    con = duckdb.connect(str(DB_PATH))
+    try:
+        if init:
+            exec_sql(con, SQL_CREATE_RAW)
+
+        load_raw_for_date(con, date_str, tables)
+
+        if rebuild:
+            rebuild_mart(con)
+    finally:
+        con.close()
+    print("[OK] duckdb load/build done")
 
 
 def main() -> None:
@@ -99,20 +163,7 @@ def main() -> None:
     p.add_argument("--rebuild-mart", action="store_true", help="Rebuild mart tables")
     args = p.parse_args()
 
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-    con = duckdb.connect(str(DB_PATH))
-
-    if args.init:
-        exec_sql(con, SQL_CREATE_RAW)
-
-    load_csv_for_date(con, args.date)
-
-    if args.rebuild_mart:
-        rebuild_mart(con)
-
-    con.close()
-    print("[OK] duckdb load/build done")
+    run(args.date, init=args.init, rebuild=args.rebuild_mart)
 
 
 if __name__ == "__main__":
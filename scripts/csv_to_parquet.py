@@ -0,0 +1,134 @@
+"""
+Raw CSV -> Parquet 변환기 (Stage 1 보조)
+
+역할:
+- 날짜별 raw CSV(구버전 generate_realistic_data.py 출력 / 외부 CSV)를 타입이 확정된 Parquet(ZSTD)로 1회 변환
+- 압축 CSV(.csv.zst / .csv.gz)도 그대로 입력으로 사용 (DuckDB가 확장자로 압축을 판별해 스트리밍 해제)
+- build_duckdb.py 는 CSV 대신 Parquet를 읽어 raw 테이블에 적재
+- 현재 생성기는 Parquet를 직접 쓰므로, CSV가 없으면 변환 없이 기존 Parquet를 사용
+
+왜 Parquet인가:
+- read_csv_auto 는 호출마다 스키마를 다시 추론(sniffing)하고 문자열 파싱 비용이 듭니다.
+- Parquet는 컬럼형 + 압축 + 타입/통계(min/max) 메타데이터를 갖고 있어
+  DuckDB가 그대로 스캔할 수 있고, 재적재/재실행 시 파싱을 반복하지 않습니다.
+
+주의:
+- CSV 변환 시 CAST 규칙(스키마)은 이 파일에 있습니다. raw 테이블 DDL(sql/create_raw_tables.sql)과 컬럼 순서를 맞춥니다.
+- CSV가 Parquet보다 최신이면(재생성) 다시 변환합니다.
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import duckdb
+
+
+RAW_DIR = Path("data/raw")
+
+# raw 테이블 컬럼 순서와 동일하게 유지
+AD_EVENTS_SELECT = """
+SELECT
+  CAST(event_date AS DATE)       AS event_date,
+  CAST(event_ts AS TIMESTAMP)    AS event_ts,
+  CAST(event_type AS VARCHAR)    AS event_type,
+  CAST(campaign_id AS VARCHAR)   AS campaign_id,
+  CAST(ad_id AS VARCHAR)         AS ad_id,
+  CAST(user_id AS VARCHAR)       AS user_id,
+  CAST(device_os AS VARCHAR)     AS device_os,
+  CAST(country AS VARCHAR)       AS country,
+  CAST(cost AS DOUBLE)           AS cost,
+  CAST(revenue AS DOUBLE)        AS revenue
+FROM read_csv_auto('{src}', header=true)
+"""
+
+PAYMENT_EVENTS_SELECT = """
+SELECT
+  CAST(event_date AS DATE)       AS event_date,
+  CAST(event_ts AS TIMESTAMP)    AS event_ts,
+  CAST(order_id AS VARCHAR)      AS order_id,
+  CAST(user_id AS VARCHAR)       AS user_id,
+  CAST(campaign_id AS VARCHAR)   AS campaign_id,
+  CAST(amount AS DOUBLE)         AS amount,
+  CAST(currency AS VARCHAR)      AS currency,
+  CAST(status AS VARCHAR)        AS status,
+  CAST(fail_reason AS VARCHAR)   AS fail_reason
+FROM read_csv_auto('{src}', header=true)
+"""
+
+# 찾는 순서대로: 비압축 -> zstd -> gzip
+CSV_SUFFIXES = (".csv", ".csv.zst", ".csv.gz")
+
+SELECT_BY_PREFIX = {
+    "ad_events": AD_EVENTS_SELECT,
+    "payment_events": PAYMENT_EVENTS_SELECT,
+}
+
+
+def to_yyyymmdd(date_str: str) -> str:
+    return date_str.replace("-", "")
+
+
+def parquet_path(prefix: str, date_str: str, raw_dir: Path = RAW_DIR) -> Path:
+    return (raw_dir / f"{prefix}_{to_yyyymmdd(date_str)}.parquet").resolve()
+
+
+def find_csv(prefix: str, date_str: str, raw_dir: Path = RAW_DIR) -> Path | None:
+    """해당 날짜의 raw CSV(압축 포함) 경로, 없으면 None."""
+    ds = to_yyyymmdd(date_str)
+    for suffix in CSV_SUFFIXES:
+        path = (raw_dir / f"{prefix}_{ds}{suffix}").resolve()
+        if path.exists():
+            return path
+    return None
+
+
+def convert_csv(prefix: str, csv_path: Path, pq_path: Path) -> None:
+    """
+    CSV 1개 -> Parquet 1개 (CAST 적용, ZSTD 압축).
+    - .csv.zst / .csv.gz 는 read_csv_auto 가 확장자로 압축을 판별해 바로 읽음
+    """
+    select_sql = SELECT_BY_PREFIX[prefix].format(src=csv_path.as_posix())
+    duckdb.sql(
+        f"COPY ({select_sql}) TO '{pq_path.as_posix()}' (FORMAT PARQUET, COMPRESSION ZSTD)"
+    )
+
+
+def ensure_parquet_for_date(date_str: str, raw_dir: Path = RAW_DIR) -> dict[str, Path]:
+    """
+    해당 날짜의 raw Parquet를 보장하고 {prefix: parquet_path} 를 반환.
+    - Parquet가 없거나 CSV보다 오래됐으면 변환
+    - CSV 없이 Parquet만 있어도 그대로 사용
+    """
+    out: dict[str, Path] = {}
+
+    for prefix in SELECT_BY_PREFIX:
+        csv_path = find_csv(prefix, date_str, raw_dir)
+        pq_path = parquet_path(prefix, date_str, raw_dir)
+
+        if csv_path is not None:
+            if not pq_path.exists() or pq_path.stat().st_mtime < csv_path.stat().st_mtime:
+                convert_csv(prefix, csv_path, pq_path)
+        elif not pq_path.exists():
+            raise FileNotFoundError(
+                "raw parquet/csv not found. 먼저 scripts/generate_realistic_data.py 를 실행하세요."
+            )
+
+        out[prefix] = pq_path
+
+    return out
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--date", required=True, help="YYYY-MM-DD")
+    args = p.parse_args()
+
+    paths = ensure_parquet_for_date(args.date)
+    for prefix, path in paths.items():
+        print(f"[OK] {prefix} -> {path}")
+
+
+if __name__ == "__main__":
+    main()
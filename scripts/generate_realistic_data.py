@@ -1,21 +1,25 @@
 """
-Synthetic CSV 생성기 (Stage 1)
+Synthetic raw 데이터 생성기 (Stage 1)
 
 핵심 설계:
-- raw 로딩 안정성을 위해 event_date는 'YYYY-MM-DD' 문자열로 CSV에 저장합니다. (VARCHAR)
-- event_ts는 ISO 형태로 저장되어 DuckDB에서 TIMESTAMP로 캐스팅 가능하게 합니다.
+- raw 파일은 타입이 있는 Parquet(ZSTD, dictionary 인코딩)로 저장합니다.
+  -> event_date는 DATE, event_ts는 TIMESTAMP로 기록되어 적재 시 문자열 파싱/CAST가 필요 없습니다.
 - anomaly 옵션으로 특정 캠페인(C007)에 이상치(매출 급락/결제실패 증가)를 주입할 수 있습니다.
+- pandas를 쓰지 않고 numpy 배열(타임스탬프 포함)을 Arrow Table로 넘겨 pyarrow.parquet로 씁니다.
+- ad_events / payment_events 는 seed에서 파생한 독립 난수 스트림으로 생성합니다.
 
 출력:
-- data/raw/ad_events_YYYYMMDD.csv
-- data/raw/payment_events_YYYYMMDD.csv
+- data/raw/ad_events_YYYYMMDD.parquet
+- data/raw/payment_events_YYYYMMDD.parquet
 """
 
 import argparse
 from pathlib import Path
 
 import numpy as np
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
 
 RAW_DIR = Path("data/raw")
@@ -25,59 +29,101 @@ def to_yyyymmdd(date_str: str) -> str:
     return date_str.replace("-", "")
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--date", required=True, help="YYYY-MM-DD")
-    parser.add_argument("--rows", type=int, default=20000, help="ad_events row count")
-    parser.add_argument("--seed", type=int, default=42)
-    parser.add_argument("--anomaly", action="store_true", help="Inject anomaly scenario")
-    args = parser.parse_args()
-
-    np.random.seed(args.seed)
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-
-    date_str = args.date
-    ds = to_yyyymmdd(date_str)
-
-    # 도메인 느낌만 살리는 최소 차원
-    campaigns = [f"C{n:03d}" for n in range(1, 21)]
-    ads = [f"A{n:04d}" for n in range(1, 401)]
-    os_list = ["iOS", "Android", "Web"]
-    countries = ["KR", "JP", "US", "SG", "TW"]
-
-    # 1) ad_events 생성
-    n = args.rows
-    event_type = np.random.choice(
-        ["impression", "click", "conversion"],
-        size=n,
-        p=[0.88, 0.10, 0.02],
-    )
-    campaign_id = np.random.choice(campaigns, size=n)
-    ad_id = np.random.choice(ads, size=n)
-    user_id = np.random.randint(1, 200000, size=n).astype(str)
-    device_os = np.random.choice(os_list, size=n, p=[0.45, 0.45, 0.10])
-    country = np.random.choice(countries, size=n, p=[0.55, 0.20, 0.10, 0.10, 0.05])
+def write_parquet(columns: dict, path: Path) -> pa.Table:
+    """
+    numpy 배열 dict -> Arrow Table -> Parquet (ZSTD + dictionary 인코딩).
+    - pandas를 거치지 않음
+    - 스칼라 값(event_date, currency)은 값 n개를 만들지 않고 항목 1개짜리 dictionary 컬럼으로 기록
+      (index는 int8 0으로만 채움 -> Parquet에서는 dictionary/RLE로 사실상 상수 1개)
+    - 컬럼 순서는 raw 테이블 DDL(sql/create_raw_tables.sql)과 동일하게 유지 (적재 시 SELECT *)
+    - 기록한 Arrow Table을 반환 (in-process 적재 시 Parquet를 다시 읽지 않도록)
+    """
+    n = max(len(v) for v in columns.values() if not np.isscalar(v))
+    zeros = pa.array(np.zeros(n, dtype=np.int8))
+    arrays = {
+        k: pa.DictionaryArray.from_arrays(zeros, pa.array(np.array([v]))) if np.isscalar(v) else pa.array(v)
+        for k, v in columns.items()
+    }
+    tbl = pa.table(arrays)
+    pq.write_table(tbl, path, compression="zstd", use_dictionary=True)
+    return tbl
+
+
+# 도메인 느낌만 살리는 최소 차원
+CAMPAIGNS = [f"C{n:03d}" for n in range(1, 21)]
+ADS = [f"A{n:04d}" for n in range(1, 401)]
+OS_LIST = ["iOS", "Android", "Web"]
+COUNTRIES = ["KR", "JP", "US", "SG", "TW"]
+
+# event_type 값과 샘플링 확률 (index = 샘플링 code)
+EVENT_TYPES = np.array(["impression", "click", "conversion"])
+EVENT_TYPE_P = [0.88, 0.10, 0.02]
+CLICK, CONVERSION = 1, 2
+
+# anomaly 시나리오 대상 캠페인
+ANOMALY_CAMPAIGN = "C007"
+
+
+def _rngs(seed: int) -> tuple[np.random.Generator, np.random.Generator]:
+    """
+    seed 하나에서 ad / payment 용 독립 난수 스트림 2개를 파생 (SeedSequence.spawn).
+    - payment 쪽 난수 소비가 ad 쪽 결과(행 수 등)에 영향을 주지 않음
+    - Generator API(PCG64): 전역 RandomState를 쓰지 않음
+    """
+    ad_seq, pay_seq = np.random.SeedSequence(seed).spawn(2)
+    return np.random.default_rng(ad_seq), np.random.default_rng(pay_seq)
+
+
+def _day_start(date_str: str) -> np.datetime64:
+    # 해당 날짜 00:00:00 (초 단위)
+    return np.datetime64(date_str, "s")
+
+
+def _sample_event_codes(rng: np.random.Generator, n: int) -> np.ndarray:
+    # 문자열 대신 정수 code로 뽑아 마스크/카운트는 정수 비교로 처리
+    return rng.choice(len(EVENT_TYPES), size=n, p=EVENT_TYPE_P)
+
+
+def gen_ad(date_str: str, n: int, seed: int, anomaly: bool) -> tuple[pa.Table, int]:
+    """
+    ad_events 생성 -> data/raw/ad_events_YYYYMMDD.parquet
+    - 반환: (기록한 Arrow Table, conversion 수) / conversion 수는 gen_pay의 결제 건수 산정에 사용
+    """
+    rng, _ = _rngs(seed)
+
+    event_code = _sample_event_codes(rng, n)
+    event_type = EVENT_TYPES[event_code]
+    campaign_id = rng.choice(CAMPAIGNS, size=n)
+    ad_id = rng.choice(ADS, size=n)
+    # int64 그대로 기록 (적재 시 raw 테이블의 VARCHAR로 변환)
+    user_id = rng.integers(1, 200000, size=n)
+    device_os = rng.choice(OS_LIST, size=n, p=[0.45, 0.45, 0.10])
+    country = rng.choice(COUNTRIES, size=n, p=[0.55, 0.20, 0.10, 0.10, 0.05])
 
     # 비용/매출 (단순 모델)
-    cost = np.where(event_type == "click", np.random.gamma(2.0, 0.3, size=n), 0.0)
-    revenue = np.where(event_type == "conversion", np.random.gamma(4.0, 3.0, size=n), 0.0)
+    # 0으로 채운 뒤 click/conversion 행만큼만 난수를 뽑아 채움 (n개를 뽑고 버리지 않음)
+    click_mask = event_code == CLICK
+    conv_mask = event_code == CONVERSION
+    cost = np.zeros(n, dtype=np.float64)
+    cost[click_mask] = rng.gamma(2.0, 0.3, size=int(click_mask.sum()))
+    revenue = np.zeros(n, dtype=np.float64)
+    revenue[conv_mask] = rng.gamma(4.0, 3.0, size=int(conv_mask.sum()))
 
     # 이상치: 특정 캠페인(C007) conversion revenue 급락
-    if args.anomaly:
-        target = "C007"
-        mask = (campaign_id == target) & (event_type == "conversion")
+    if anomaly:
+        mask = (campaign_id == ANOMALY_CAMPAIGN) & conv_mask
         revenue[mask] = revenue[mask] * 0.15
 
     # timestamp: 하루(0~86400초) 내 분포
-    base = pd.Timestamp(date_str)
-    seconds = np.random.randint(0, 24 * 3600, size=n)
-    event_ts = base + pd.to_timedelta(seconds, unit="s")
+    # datetime64[s] -> Parquet TIMESTAMP
+    event_ts = _day_start(date_str) + rng.integers(0, 24 * 3600, size=n).astype("timedelta64[s]")
 
-    ad_df = pd.DataFrame(
+    ad_path = RAW_DIR / f"ad_events_{to_yyyymmdd(date_str)}.parquet"
+    tbl = write_parquet(
         {
-            # 중요: event_date는 문자열로 고정(VARCHAR 타깃)
-            "event_date": date_str,
-            "event_ts": event_ts,  # pandas가 ISO로 출력 -> DuckDB TIMESTAMP 캐스팅 용이
+            # event_date는 DATE(date32)로 기록
+            "event_date": np.datetime64(date_str, "D"),
+            "event_ts": event_ts,
             "event_type": event_type,
             "campaign_id": campaign_id,
             "ad_id": ad_id,
@@ -86,53 +132,83 @@ def main() -> None:
             "country": country,
             "cost": cost,
             "revenue": revenue,
-        }
+        },
+        ad_path,
     )
+    print(f"[OK] generated: {ad_path}")
+    return tbl, int(np.count_nonzero(conv_mask))
 
-    ad_path = RAW_DIR / f"ad_events_{ds}.csv"
-    ad_df.to_csv(ad_path, index=False)
 
-    # 2) payment_events 생성
+def gen_pay(date_str: str, n_conv: int, seed: int, anomaly: bool) -> pa.Table:
+    """payment_events 생성 -> data/raw/payment_events_YYYYMMDD.parquet (기록한 Arrow Table 반환)"""
+    _, rng = _rngs(seed)
+    ds = to_yyyymmdd(date_str)
+
     # conversion 일부를 결제 이벤트로 연결한 느낌(완전 매칭은 아니고 "현실적 근사")
-    conv = ad_df[ad_df["event_type"] == "conversion"]
-    m = max(int(len(conv) * 0.6), 300)
-
-    pay_campaign = np.random.choice(campaigns, size=m)
-
-    # 이상치: C007 결제 실패율 증가
-    if args.anomaly:
-        fail_boost = (pay_campaign == "C007")
-        fail_prob = np.where(fail_boost, 0.25, 0.06)
-    else:
-        fail_prob = np.full(m, 0.06)
-
-    status = np.where(np.random.rand(m) < fail_prob, "failed", "success")
-    fail_reason = np.where(
-        status == "failed",
-        np.random.choice(["timeout", "insufficient_funds", "3ds_failed"], size=m),
-        "",
+    m = max(int(n_conv * 0.6), 300)
+
+    pay_campaign = rng.choice(CAMPAIGNS, size=m)
+
+    # 기본 실패율로 채운 뒤, 이상치(C007 결제 실패율 증가)는 해당 행만 덮어씀
+    fail_prob = np.full(m, 0.06)
+    if anomaly:
+        target_mask = pay_campaign == ANOMALY_CAMPAIGN
+        fail_prob[target_mask] = 0.25
+
+    status = np.where(rng.random(m) < fail_prob, "failed", "success")
+    # 성공 건은 null로 기록
+    fail_reason = pa.array(
+        rng.choice(["timeout", "insufficient_funds", "3ds_failed"], size=m),
+        mask=(status != "failed"),
     )
 
-    pay_df = pd.DataFrame(
+    pay_ts = _day_start(date_str) + rng.integers(0, 24 * 3600, size=m).astype("timedelta64[s]")
+
+    pay_path = RAW_DIR / f"payment_events_{ds}.parquet"
+    tbl = write_parquet(
         {
-            "event_date": date_str,  # 문자열 고정
-            "event_ts": base + pd.to_timedelta(np.random.randint(0, 24 * 3600, size=m), unit="s"),
-            "order_id": [f"O{ds}{i:06d}" for i in range(m)],
-            "user_id": np.random.randint(1, 200000, size=m).astype(str),
+            "event_date": np.datetime64(date_str, "D"),
+            "event_ts": pay_ts,
+            # O + YYYYMMDD + 6자리 순번 (Python 루프 대신 Arrow compute로 한 번에 생성)
+            "order_id": pc.binary_join_element_wise(
+                f"O{ds}", pc.utf8_lpad(pa.array(np.arange(m)).cast(pa.string()), 6, "0"), ""
+            ),
+            "user_id": rng.integers(1, 200000, size=m),
             "campaign_id": pay_campaign,
-            "amount": np.round(np.random.gamma(3.0, 10.0, size=m), 2),
+            "amount": np.round(rng.gamma(3.0, 10.0, size=m), 2),
             "currency": "KRW",
             "status": status,
             "fail_reason": fail_reason,
-        }
+        },
+        pay_path,
     )
+    print(f"[OK] generated: {pay_path}")
+    return tbl
 
-    pay_path = RAW_DIR / f"payment_events_{ds}.csv"
-    pay_df.to_csv(pay_path, index=False)
 
-    print(f"[OK] generated: {ad_path}")
-    print(f"[OK] generated: {pay_path}")
+def run(date_str: str, rows: int, seed: int, anomaly: bool = False) -> dict[str, pa.Table]:
+    """
+    하루치 raw Parquet 2개를 생성하고 {테이블 prefix: Arrow Table} 을 반환 (run_daily_pipeline 에서 in-process 호출용).
+    - gen_ad -> gen_pay 순서로 같은 프로세스에서 생성 (결제 건수는 gen_ad의 conversion 수로 산정)
+    - 반환한 Table은 build_duckdb.run(tables=...) 로 넘겨 Parquet 재스캔 없이 적재
+    """
+    RAW_DIR.mkdir(parents=True, exist_ok=True)
+
+    ad_tbl, n_conv = gen_ad(date_str, rows, seed, anomaly)
+    pay_tbl = gen_pay(date_str, n_conv, seed, anomaly)
+    return {"ad_events": ad_tbl, "payment_events": pay_tbl}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--date", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--rows", type=int, default=20000, help="ad_events row count")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anomaly", action="store_true", help="Inject anomaly scenario")
+    args = parser.parse_args()
+
+    run(args.date, args.rows, args.seed, args.anomaly)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
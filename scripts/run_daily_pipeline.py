@@ -4,7 +4,7 @@ Daily Pipeline Orchestrator (Stage 1 + LLM Insight)
 이 스크립트는 하루 단위 데이터 파이프라인을 오케스트레이션한다.
 
 수행 단계:
-1) Synthetic CSV 생성 (date 기반 seed로 재현성 확보)
+1) Synthetic raw Parquet 생성 (date 기반 seed로 재현성 확보)
 2) DuckDB 초기화 및 mart 재빌드
 3) Data Quality 리포트 생성
 4) (옵션) LLM 기반 자동 인사이트 생성
@@ -16,16 +16,21 @@ Daily Pipeline Orchestrator (Stage 1 + LLM Insight)
 """
 
 import argparse
-import hashlib
 import subprocess
 import sys
+import zlib
 from pathlib import Path
 
 # 프로젝트 루트 import 경로 확보
 # (모듈 실행 시 import 경로 깨지는 문제 방지)
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-from validators.data_quality import run_dq
+from validators.data_quality import close_connection, run_dq
+
+# 단계 모듈은 프로젝트 루트 기준으로 import (python scripts/... / python -m scripts... 모두 동작)
+# - subprocess 대신 in-process 호출: 단계마다 인터프리터 기동 + numpy/pyarrow/duckdb import 비용을 반복하지 않음
+from scripts.build_duckdb import run as build_run
+from scripts.generate_realistic_data import run as gen_run
 
 
 # -------------------------------------------------
@@ -33,7 +38,7 @@ from validators.data_quality import run_dq
 # -------------------------------------------------
 def sh(cmd: list[str]) -> None:
     """
-    외부 스크립트를 subprocess로 실행한다.
+    외부 스크립트를 subprocess로 실행한다. (현재는 LLM 단계만 사용)
     실패 시 즉시 예외 발생하여 파이프라인 중단.
     """
     print(f"[RUN] {' '.join(cmd)}")
@@ -45,7 +50,9 @@ def sh(cmd: list[str]) -> None:
 # -------------------------------------------------
 def stable_seed_from_date(date_str: str, modulo: int = 100000) -> int:
     """
-    날짜 문자열을 해시하여 항상 동일한 seed를 생성한다.
+    날짜 문자열을 해시(CRC32)하여 항상 동일한 seed를 생성한다.
+    보안 용도가 아니므로 암호학적 해시(SHA-256) 대신 CRC32 사용
+    (내장 hash()는 프로세스마다 salt가 달라 재현성이 깨지므로 사용하지 않음)
 
     목적:
     - 날짜별 서로 다른 데이터 생성
@@ -55,8 +62,7 @@ def stable_seed_from_date(date_str: str, modulo: int = 100000) -> int:
       2026-02-19 → 항상 같은 seed
       2026-02-18 → 다른 seed
     """
-    h = hashlib.sha256(date_str.encode("utf-8")).hexdigest()
-    return int(h[:8], 16) % modulo
+    return zlib.crc32(date_str.encode("utf-8")) % modulo
 
 
 # -------------------------------------------------
@@ -90,7 +96,7 @@ def main():
     # anomaly 시나리오 강제 주입 여부
     parser.add_argument("--anomaly", action="store_true")
 
-    # 이미 raw CSV가 있는 경우 generate skip
+    # 이미 raw 파일이 있는 경우 generate skip
     parser.add_argument("--skip-generate", action="store_true")
 
     # LLM 인사이트 생성 여부
@@ -110,37 +116,21 @@ def main():
     print(f"[INFO] Using seed={seed}")
 
     # -------------------------------------------------
-    # 2) Synthetic CSV 생성
+    # 2) Synthetic raw Parquet 생성
     # -------------------------------------------------
+    # 생성 결과(Arrow Table)는 적재 단계로 바로 넘김 (skip 시 None → raw Parquet 스캔)
+    tables = None
     if not args.skip_generate:
-        cmd = [
-            py,
-            "scripts/generate_realistic_data.py",
-            "--date", args.date,
-            "--rows", str(args.rows),
-            "--seed", str(seed),
-        ]
-
-        # anomaly 플래그 전달
-        if args.anomaly:
-            cmd.append("--anomaly")
-
-        sh(cmd)
+        tables = gen_run(args.date, args.rows, seed, args.anomaly)
     else:
-        print("[SKIP] CSV generation skipped")
+        print("[SKIP] raw generation skipped")
 
     # -------------------------------------------------
     # 3) DuckDB 적재 + mart 재생성
     # -------------------------------------------------
-    # --init: 테이블 자동 생성
-    # --rebuild-mart: 날짜 단위 집계 재계산
-    sh([
-        py,
-        "scripts/build_duckdb.py",
-        "--date", args.date,
-        "--init",
-        "--rebuild-mart"
-    ])
+    # init: 테이블 자동 생성
+    # rebuild: 날짜 단위 집계 재계산
+    build_run(args.date, init=True, rebuild=True, tables=tables)
 
     # -------------------------------------------------
     # 4) Data Quality Report 생성
@@ -148,6 +138,9 @@ def main():
     report_path = run_dq(args.date)
     print(f"[OK] DQ report generated: {report_path}")
 
+    # DQ 연결(DB 파일 lock)을 LLM subprocess 실행 전에 반납
+    close_connection()
+
     # -------------------------------------------------
     # 5) LLM Insight (옵션)
     # -------------------------------------------------
@@ -1,13 +1,16 @@
 -- 목적:
---   raw 레이어(문자열 event_date)를 mart 레이어(날짜형 event_date)로 정규화하여
---   일별/캠페인별 KPI를 생성합니다.
+--   raw 레이어(DATE event_date)를 일별/캠페인별 KPI mart로 집계합니다.
+--   event_date 순으로 정렬해 저장하여 row group의 min/max(zonemap)가 촘촘해지도록 합니다.
+--   (fetch_kpis 의 8일 범위 조회 등 날짜 필터가 불필요한 row group을 건너뜀)
+--   preserve_insertion_order=false 는 설정하지 않습니다: 병렬 CTAS에서 ORDER BY 순서가 깨져 zonemap 이점이 사라짐.
+--   row group 크기는 DuckDB 고정값(122,880 rows)을 사용하며, 빌드 후 scripts/build_duckdb.py 가 레이아웃을 점검합니다.
 
 DROP TABLE IF EXISTS mart.daily_campaign_kpi;
 
 CREATE TABLE mart.daily_campaign_kpi AS
 WITH ad AS (
   SELECT
-    CAST(event_date AS DATE) AS event_date,         -- 여기서 DATE로 정규화
+    event_date,
     campaign_id,
 
     SUM(CASE WHEN event_type='impression' THEN 1 ELSE 0 END) AS impressions,
@@ -21,7 +24,7 @@ WITH ad AS (
 ),
 pay AS (
   SELECT
-    CAST(event_date AS DATE) AS event_date,
+    event_date,
     campaign_id,
 
     COUNT(*) AS payments_total,
@@ -67,4 +70,5 @@ SELECT
 FROM ad
 FULL OUTER JOIN pay
   ON ad.event_date = pay.event_date
- AND ad.campaign_id = pay.campaign_id;
\ No newline at end of file
+ AND ad.campaign_id = pay.campaign_id
+ORDER BY event_date, campaign_id;
\ No newline at end of file
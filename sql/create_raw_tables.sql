@@ -1,15 +1,17 @@
 -- 목적:
 --   1) raw/mart 스키마를 만들고
---   2) CSV 로딩 안정성을 위해 raw.event_date 를 VARCHAR로 고정합니다.
---      (CSV → DuckDB 로딩 시 DATE 타입 추론/파싱 이슈를 피함)
---   3) Mart 단계에서 CAST(event_date AS DATE)로 정규화합니다.
+--   2) raw.event_date 를 DATE로 저장합니다.
+--      (CSV의 'YYYY-MM-DD' 문자열은 적재 시 CAST(event_date AS DATE)로 명시 변환)
+--      -> 날짜 조건이 문자열 비교가 아닌 정수 비교가 되고, row group min/max(zonemap)로 필터링 가능
+--   3) 기존 DB가 VARCHAR 스키마라면 CREATE IF NOT EXISTS로는 바뀌지 않으므로
+--      data/portfolio.duckdb 를 지우고 --init 으로 재생성하세요.
 
 CREATE SCHEMA IF NOT EXISTS raw;
 CREATE SCHEMA IF NOT EXISTS mart;
 
 -- 광고 이벤트(노출/클릭/전환)
 CREATE TABLE IF NOT EXISTS raw.ad_events (
-  event_date  VARCHAR,        -- 'YYYY-MM-DD' 문자열로 저장 (로딩 안정성)
+  event_date  DATE,           -- 적재 시 'YYYY-MM-DD' → DATE 변환
   event_ts    TIMESTAMP,      -- 이벤트 발생 시각(ISO timestamp로 CSV에 저장)
   event_type  VARCHAR,        -- impression / click / conversion
   campaign_id VARCHAR,
@@ -23,7 +25,7 @@ CREATE TABLE IF NOT EXISTS raw.ad_events (
 
 -- 결제 이벤트(성공/실패)
 CREATE TABLE IF NOT EXISTS raw.payment_events (
-  event_date   VARCHAR,       -- 'YYYY-MM-DD'
+  event_date   DATE,
   event_ts     TIMESTAMP,
   order_id     VARCHAR,
   user_id      VARCHAR,
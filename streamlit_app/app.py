@@ -1,6 +1,9 @@
 """
 Streamlit Ask AI (Text2SQL BI Agent)
 - 자연어 질문 -> LLM(Text2SQL) -> SQL Guard -> DuckDB 실행 -> 결과 테이블/차트 표시
+- 실행은 공유 read-only 연결 1개 + lock (결과 fetch까지 lock 안에서 처리해 세션 간 결과 섞임 방지)
+- 결과는 Arrow Table로 표시하고, 차트는 필요한 두 컬럼만으로 pandas Series를 만들어 그림
+- 같은 질문의 LLM 결과 / 같은 SQL의 실행 결과는 st.cache_data로 재사용 (DB 파일이 바뀌면 결과 캐시 무효화)
 
 핵심 포인트
 - 반드시 llm/sql_guard.py를 사용 (import 경로 고정)
@@ -10,19 +13,29 @@ Streamlit Ask AI (Text2SQL BI Agent)
 from __future__ import annotations
 
 import re
+import threading
 from pathlib import Path
 
 import duckdb
 import pandas as pd
+import pyarrow as pa
 import streamlit as st
 
-from llm.text2sql import generate_sql
+from llm.text2sql import Text2SQLResult, generate_sql
 from llm.sql_guard import validate_sql, SQLGuardError
 
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DUCKDB_PATH = PROJECT_ROOT / "data" / "portfolio.duckdb"
 
+# LLM 응답의 ```sql ... ``` 코드블록 (클릭마다 다시 컴파일하지 않도록 모듈 로드 시 1회)
+_SQL_BLOCK_RE = re.compile(r"```sql\s*(.*?)```", re.IGNORECASE | re.DOTALL)
+
+# 같은 질문의 Text2SQL(LLM) 결과 재사용 기간
+TEXT2SQL_CACHE_TTL_SEC = 3600
+# 쿼리 결과(Arrow Table) 캐시 최대 개수
+RESULT_CACHE_MAX_ENTRIES = 128
+
 
 # -----------------------
 # 유틸
@@ -36,7 +49,7 @@ def extract_sql(text: str) -> str:
     """
     if not text:
         return ""
-    m = re.search(r"```sql\s*(.*?)```", text, flags=re.IGNORECASE | re.DOTALL)
+    m = _SQL_BLOCK_RE.search(text)
     if m:
         return m.group(1).strip()
     return text.replace("```", "").strip()
@@ -49,16 +62,44 @@ def get_con() -> duckdb.DuckDBPyConnection:
     return duckdb.connect(str(DUCKDB_PATH), read_only=True)
 
 
-def render_line_chart_if_possible(df: pd.DataFrame) -> None:
+@st.cache_resource
+def get_con_lock() -> threading.Lock:
+    # get_con()과 같은 수명: Streamlit 세션(스레드)들이 같은 연결을 공유하므로 실행+fetch를 직렬화
+    return threading.Lock()
+
+
+def run_sql(safe_sql: str) -> pa.Table:
+    # con.execute()는 연결 자신을 돌려주므로 fetch까지 lock 안에서 끝냄
+    with get_con_lock():
+        return get_con().execute(safe_sql).fetch_arrow_table()
+
+
+@st.cache_data(ttl=TEXT2SQL_CACHE_TTL_SEC, show_spinner=False)
+def cached_generate_sql(q: str) -> Text2SQLResult:
+    # 같은 질문이면 LLM 왕복 생략
+    return generate_sql(q)
+
+
+@st.cache_data(max_entries=RESULT_CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_run_sql(safe_sql: str, db_mtime_ns: int) -> pa.Table:
+    # db_mtime_ns는 캐시 키 용도: 파이프라인이 DuckDB 파일을 갱신하면 키가 바뀌어 다시 실행
+    return run_sql(safe_sql)
+
+
+def render_line_chart_if_possible(tbl: pa.Table) -> None:
     """
     결과가 (date-like column + numeric column) 형태면 라인차트도 추가로 그림
+    - 컬럼 판별은 Arrow 스키마로 하고, DataFrame 없이 x(index) / y(values) 두 컬럼만으로 Series 구성
     """
-    if df is None or df.empty:
+    if tbl is None or tbl.num_rows == 0:
         return
 
     # date 컬럼 후보
-    date_cols = [c for c in df.columns if "date" in c.lower() or "time" in c.lower()]
-    num_cols = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    date_cols = [f.name for f in tbl.schema if "date" in f.name.lower() or "time" in f.name.lower()]
+    num_cols = [
+        f.name for f in tbl.schema
+        if pa.types.is_integer(f.type) or pa.types.is_floating(f.type) or pa.types.is_decimal(f.type)
+    ]
 
     if not date_cols or not num_cols:
         return
@@ -67,10 +108,13 @@ def render_line_chart_if_possible(df: pd.DataFrame) -> None:
     y = num_cols[0]
 
     try:
-        # 스트림릿은 x축 dtype이 datetime이면 더 예쁘게 나옴
-        df2 = df.copy()
-        df2[x] = pd.to_datetime(df2[x], errors="ignore")
-        st.line_chart(df2.set_index(x)[y])
+        idx = tbl.column(x).to_pandas()
+        # 스트림릿은 x축 dtype이 datetime이면 더 예쁘게 나옴 (이미 datetime이면 변환 생략)
+        if not pd.api.types.is_datetime64_any_dtype(idx):
+            idx = pd.to_datetime(idx, errors="coerce")
+        # DECIMAL은 pandas에서 object(Decimal)가 되므로 float로 맞춤
+        values = tbl.column(y).cast(pa.float64()).to_numpy()
+        st.line_chart(pd.Series(values, index=idx, name=y))
     except Exception:
         # 차트 실패해도 테이블은 보여주면 됨
         pass
@@ -88,10 +132,11 @@ run = st.button("Ask AI")
 
 if run:
     try:
-        con = get_con()
+        # DB 파일이 없으면 LLM 호출 전에 중단
+        get_con()
 
-        # 1) LLM으로 SQL 생성
-        t2s = generate_sql(q)
+        # 1) LLM으로 SQL 생성 (같은 질문은 캐시)
+        t2s = cached_generate_sql(q.strip())
         llm_sql = extract_sql(t2s.sql)
 
         st.subheader("LLM Generated SQL")
@@ -104,14 +149,17 @@ if run:
         st.code(safe_sql, language="sql")
 
         # 3) 실행
-        df = con.execute(safe_sql).df()
+        # - 결과는 Arrow Table로 받아 그대로 표시 (pandas DataFrame 전체 복사 생략)
+        # - 행 수는 validate_sql이 LIMIT(기본 DEFAULT_LIMIT, 최대 MAX_LIMIT)으로 이미 제한
+        # - (safe_sql, DB 파일 mtime) 단위로 결과 캐시
+        tbl = cached_run_sql(safe_sql, DUCKDB_PATH.stat().st_mtime_ns)
 
         st.subheader("Result")
-        st.dataframe(df, use_container_width=True)
+        st.dataframe(tbl, use_container_width=True)
 
         # 4) 차트(가능하면)
         st.subheader("Chart (auto)")
-        render_line_chart_if_possible(df)
+        render_line_chart_if_possible(tbl)
 
     except SQLGuardError as e:
         st.error(f"에러 발생: {str(e)}")
@@ -14,6 +14,9 @@ Data Quality Validator (Stage 1)
 
 from __future__ import annotations
 
+import atexit
+from datetime import date
+from functools import lru_cache
 from pathlib import Path
 import duckdb
 
@@ -21,6 +24,61 @@ import duckdb
 DB_PATH = Path("data/portfolio.duckdb")
 REPORT_DIR = Path("data/reports")
 
+# DQ 지표 5개를 한 번의 쿼리(= 한 번의 planning / 왕복)로 계산
+# - 당일 mart 행은 CTE(m)로 한 번만 필터링해 rowcount / PK 중복 / 실패율에 재사용
+# - 날짜는 이름 있는 파라미터($d) 하나로 바인딩
+DQ_SQL = """
+WITH m AS (
+  SELECT campaign_id, payments_total, payments_failed
+  FROM mart.daily_campaign_kpi
+  WHERE event_date = CAST($d AS DATE)
+)
+SELECT
+  -- raw rowcount
+  (SELECT COUNT(*) FROM raw.ad_events WHERE event_date = CAST($d AS DATE))      AS raw_ad,
+  (SELECT COUNT(*) FROM raw.payment_events WHERE event_date = CAST($d AS DATE)) AS raw_pay,
+  -- mart rowcount
+  (SELECT COUNT(*) FROM m)                                                     AS mart_cnt,
+  -- mart PK duplicates (event_date는 고정이므로 campaign_id 기준)
+  (SELECT COUNT(*) FROM (
+     SELECT campaign_id FROM m GROUP BY 1 HAVING COUNT(*) > 1
+  ))                                                                           AS dup,
+  -- aggregated payment fail rate
+  -- (결제 0건/행 없음 -> NULLIF로 NULL -> COALESCE로 0)
+  (SELECT COALESCE(SUM(payments_failed)::DOUBLE / NULLIF(SUM(payments_total), 0), 0)
+   FROM m)                                                                     AS fail_rate
+"""
+
+# 연결에 한 번만 PREPARE 해 두는 DQ 쿼리 이름
+DQ_STMT = "dq_metrics"
+
+
+@lru_cache(maxsize=1)
+def _con() -> duckdb.DuckDBPyConnection:
+    """
+    프로세스당 DuckDB 연결 1개를 재사용하고, DQ 쿼리는 연결 생성 시 1회만 PREPARE.
+    - DuckDB Python API에는 con.prepare가 없어 SQL 레벨 PREPARE / EXECUTE 사용
+    - 연결이 열려 있는 동안 DB 파일 lock을 잡으므로, 다른 프로세스가 DB를 열기 전에 close_connection() 호출
+    """
+    con = duckdb.connect(str(DB_PATH))
+    try:
+        con.execute(f"PREPARE {DQ_STMT} AS {DQ_SQL}")
+    except Exception:
+        # PREPARE 실패(테이블 미생성 등) 시 lru_cache에 남지 않으므로 여기서 닫아 DB 파일 lock 반납
+        con.close()
+        raise
+    return con
+
+
+def close_connection() -> None:
+    """캐시된 연결을 닫는다 (다음 run_dq 호출 시 다시 연결/PREPARE)."""
+    if _con.cache_info().currsize:
+        _con().close()
+        _con.cache_clear()
+
+
+atexit.register(close_connection)
+
 
 def _md(lines: list[str]) -> str:
     return "\n".join(lines) + "\n"
@@ -28,56 +86,15 @@ def _md(lines: list[str]) -> str:
 
 def run_dq(date_str: str) -> Path:
     """
-    date_str: 'YYYY-MM-DD' (raw에서는 VARCHAR로 저장되어 있으므로 그대로 조건 사용)
+    date_str: 'YYYY-MM-DD' (raw/mart 모두 event_date가 DATE이므로 CAST($d AS DATE)로 비교)
     """
     REPORT_DIR.mkdir(parents=True, exist_ok=True)
 
-    con = duckdb.connect(str(DB_PATH))
-
-    # raw rowcount
-    raw_ad = con.execute(
-        "SELECT COUNT(*) FROM raw.ad_events WHERE event_date = ?",
-        [date_str],
-    ).fetchone()[0]
-    raw_pay = con.execute(
-        "SELECT COUNT(*) FROM raw.payment_events WHERE event_date = ?",
-        [date_str],
-    ).fetchone()[0]
-
-    # mart rowcount (mart는 DATE 타입이므로 CAST해서 비교)
-    mart_cnt = con.execute(
-        "SELECT COUNT(*) FROM mart.daily_campaign_kpi WHERE event_date = CAST(? AS DATE)",
-        [date_str],
-    ).fetchone()[0]
-
-    # mart PK duplicates
-    dup = con.execute(
-        """
-        SELECT COUNT(*) FROM (
-          SELECT event_date, campaign_id, COUNT(*) c
-          FROM mart.daily_campaign_kpi
-          WHERE event_date = CAST(? AS DATE)
-          GROUP BY 1,2
-          HAVING c > 1
-        )
-        """,
-        [date_str],
-    ).fetchone()[0]
-
-    # aggregated payment fail rate
-    fail_rate = con.execute(
-        """
-        SELECT
-          CASE WHEN SUM(payments_total)=0 THEN 0
-               ELSE SUM(payments_failed)::DOUBLE / SUM(payments_total)
-          END
-        FROM mart.daily_campaign_kpi
-        WHERE event_date = CAST(? AS DATE)
-        """,
-        [date_str],
-    ).fetchone()[0]
-
-    con.close()
+    # EXECUTE 인자는 Python 바인딩이 안 되므로 날짜를 검증(YYYY-MM-DD)한 뒤 리터럴로 전달
+    day = date.fromisoformat(date_str).isoformat()
+    raw_ad, raw_pay, mart_cnt, dup, fail_rate = _con().execute(
+        f"EXECUTE {DQ_STMT}(d := '{day}')"
+    ).fetchone()
 
     # 단순 스코어링(포트폴리오용)
     score = 100
@@ -109,7 +126,7 @@ def run_dq(date_str: str) -> Path:
         "",
         "## Notes",
         "- Stage 1 baseline checks (rowcount/duplicates/aggregated rates).",
-        "- Raw keeps event_date as VARCHAR to avoid CSV type inference issues; Mart normalizes it to DATE.",
+        "- event_date is stored as DATE in both raw and mart (typed raw Parquet).",
     ]
 
     out = REPORT_DIR / f"dq_report_{date_str.replace('-', '')}.md"